@@ -0,0 +1,177 @@
+"""Threaded sprite loading with an on-disk cache of cropped, scaled sprites.
+
+A load is a set of named jobs, each cutting a list of rects out of one
+spritesheet and scaling them by a whole factor. Jobs run on a thread pool,
+so decoding overlaps with the loading screen. Every job's result is also
+written to the cache directory as raw RGBA, in a file named after a hash
+of the sheet's bytes and the crop rects, and the scale, so a warm start
+only reads and hashes the source file; editing a sheet or cutting it
+differently changes the hash and the stale entry is simply never read
+again. Jobs cutting different rects from the same sheet get files of
+their own instead of overwriting each other's.
+"""
+import hashlib
+import io
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from settings import ASSET_CACHE_DIR, ASSET_LOADER_THREADS
+
+CACHE_MAGIC = b"SPRITES1"
+# Magic, number of sprites; then per sprite its source rect and scaled size, followed by its pixels
+CACHE_HEADER = struct.Struct("<8sI")
+CACHE_SPRITE = struct.Struct("<HHHHHH")
+
+
+def cache_digest(data, rects):
+    """Hash of a sheet's bytes and the rects cut out of it."""
+    digest = hashlib.sha1(data)
+    digest.update(repr(rects).encode())
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir, digest, scale):
+    return os.path.join(cache_dir, f"{digest}-x{scale}.sprites")
+
+
+def read_cached_sprites(path, rects):
+    """Returns (size, RGBA bytes) per rect from a cache file, or None if it's missing or doesn't match."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        magic, count = CACHE_HEADER.unpack_from(data)
+        if magic != CACHE_MAGIC or count != len(rects):
+            return None
+        offset = CACHE_HEADER.size
+        entries = []
+        for rect in rects:
+            x, y, w, h, width, height = CACHE_SPRITE.unpack_from(data, offset)
+            offset += CACHE_SPRITE.size
+            if (x, y, w, h) != tuple(rect):
+                return None # Cached for another set of rects; the caller rebuilds it
+            entries.append((width, height))
+        sprites = []
+        for width, height in entries:
+            end = offset + width * height * 4
+            if end > len(data):
+                return None
+            sprites.append(((width, height), data[offset:end]))
+            offset = end
+        return sprites
+    except struct.error:
+        return None
+
+
+def write_cached_sprites(path, rects, sprites):
+    """Writes (size, RGBA bytes) per rect; a crash part way leaves no partial file behind."""
+    out = bytearray(CACHE_HEADER.pack(CACHE_MAGIC, len(rects)))
+    for rect, (size, _) in zip(rects, sprites):
+        out += CACHE_SPRITE.pack(*rect, *size)
+    for _, pixels in sprites:
+        out += pixels
+    # Unique per writer, as loader threads in this or another process may write the same entry at once
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary_path, "wb") as f:
+            f.write(out)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        print(f"Unable to write sprite cache {path}: {e}")
+
+
+def load_sprites(path, rects, scale=1, cache_dir=ASSET_CACHE_DIR):
+    """Cuts rects out of a spritesheet and scales them, through the cache if cache_dir is set.
+
+    Returns (surfaces, from_cache), with surfaces None if the sheet can't
+    be read. Runs on the loader threads, so it only touches surfaces it
+    creates itself.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        print(f"Unable to load image {path}: {e}")
+        return None, False
+
+    rects = [tuple(rect) for rect in rects]
+    sprites = None
+    if cache_dir:
+        cached_path = cache_path(cache_dir, cache_digest(data, rects), scale)
+        sprites = read_cached_sprites(cached_path, rects)
+    from_cache = sprites is not None
+
+    if sprites is None:
+        try:
+            sheet = pygame.image.load(io.BytesIO(data), path)
+        except pygame.error as e:
+            print(f"Unable to load image {path}: {e}")
+            return None, False
+        sprites = []
+        for rect in rects:
+            sprite = sheet.subsurface(pygame.Rect(rect))
+            if scale != 1:
+                sprite = pygame.transform.scale(sprite, (rect[2] * scale, rect[3] * scale))
+            sprites.append((sprite.get_size(), pygame.image.tobytes(sprite, "RGBA")))
+        if cache_dir:
+            write_cached_sprites(cached_path, rects, sprites)
+
+    surfaces = [pygame.image.frombytes(pixels, size, "RGBA") for size, pixels in sprites]
+    if pygame.display.get_surface() is not None:
+        surfaces = [surface.convert_alpha() for surface in surfaces]
+    return surfaces, from_cache
+
+
+class AssetLoad:
+    """A batch of sprite jobs running on the pipeline's threads.
+
+    jobs maps a name to (sheet path, rects, scale). Poll done and progress
+    from the frame loop, then take result(): {name: list of surfaces, or
+    None for a sheet that failed to load}.
+    """
+    def __init__(self, executor, jobs, cache_dir):
+        self.futures = {name: executor.submit(load_sprites, path, rects, scale, cache_dir)
+                        for name, (path, rects, scale) in jobs.items()}
+
+    @property
+    def progress(self):
+        """Fraction of jobs finished, from 0 to 1."""
+        if not self.futures:
+            return 1.0
+        return sum(future.done() for future in self.futures.values()) / len(self.futures)
+
+    @property
+    def done(self):
+        return all(future.done() for future in self.futures.values())
+
+    @property
+    def cache_hits(self):
+        """Number of finished jobs that were read from the cache instead of decoded."""
+        return sum(future.result()[1] for future in self.futures.values() if future.done())
+
+    def result(self):
+        """Waits for every job and returns their sprites by name."""
+        return {name: future.result()[0] for name, future in self.futures.items()}
+
+
+class AssetPipeline:
+    """Thread pool and cache directory shared by asset loads.
+
+    A cache_dir of None turns the disk cache off.
+    """
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, threads=ASSET_LOADER_THREADS):
+        self.cache_dir = cache_dir
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="asset-loader")
+
+    def load(self, jobs):
+        return AssetLoad(self.executor, jobs, self.cache_dir)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
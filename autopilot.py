@@ -0,0 +1,270 @@
+"""Built-in AI driver for unattended soak tests and performance captures.
+
+Autopilot stands in for pygame.key.get_pressed(): every call returns a
+key state holding A, D or nothing. It plans with a search over a grid of
+car positions ("lanes", AUTOPILOT_LANE_SPACING apart) in the tile rows
+above the car:
+
+  * a lane is safe in a row if no rock in that row or the one below it
+    (the car is a row tall) is within AUTOPILOT_MARGIN of the car, and no
+    NPC car is predicted to be alongside while the car passes the row;
+  * between rows the car can reach the lanes it can steer to in the time
+    one row scrolls by, as long as every lane it sweeps through is safe;
+  * a backward pass scores each lane by how many rows the car can survive
+    from it, and the plan follows the best scores from where the car is.
+
+The search is a generator that plans in small pieces: one rock row, a
+few NPC cars, one row of scores. keys() starts a piece only if the
+slowest recent piece of its kind still fits in the time budget, so one
+search spreads over several frames while the car keeps following the
+previous plan. Rock rows are cached between searches and only rebuilt
+when their tiles change; the extent of each tile's rock comes from the
+LevelMap, which works it out when the level's textures load.
+"""
+import time
+
+import numpy as np
+import pygame
+
+from collision import mask_span
+from game_core import KeyState
+from settings import (
+    SCREEN_WIDTH, SCALED_TILE_WIDTH, SCALED_TILE_HEIGHT, PLAYER_CAR_SPEED, BACKGROUND_SCROLL_SPEED_Y,
+    SIMULATION_TICK_RATE, AUTOPILOT_BUDGET_US, AUTOPILOT_ROWS_AHEAD, AUTOPILOT_LANE_SPACING, AUTOPILOT_MARGIN, AUTOPILOT_TRAFFIC_CHUNK,
+)
+
+NO_KEYS = KeyState()
+LEFT_KEYS = KeyState((pygame.K_a,))
+RIGHT_KEYS = KeyState((pygame.K_d,))
+
+
+class Autopilot:
+    """Plans and steers a GameCore's car; see the module docstring.
+
+    Use keys() where the main loop reads the keyboard. It is also an
+    iterator of key states, so it can replace a headless key script.
+    """
+    def __init__(self, game, budget_us=AUTOPILOT_BUDGET_US, rows_ahead=AUTOPILOT_ROWS_AHEAD,
+                 lane_spacing=AUTOPILOT_LANE_SPACING, margin=AUTOPILOT_MARGIN, traffic_chunk=AUTOPILOT_TRAFFIC_CHUNK):
+        self.game = game
+        self.budget_ns = budget_us * 1000
+        self.rows_ahead = rows_ahead
+        self.margin = margin
+        self.traffic_chunk = traffic_chunk
+
+        car_mask = game.assets.player_car_mask
+        car_width, self.car_height = car_mask.get_size()
+        self.car_left, self.car_right = mask_span(car_mask) or (0, car_width)
+        max_x = SCREEN_WIDTH - car_width
+        self.lane_x = np.arange(0, max_x + 1, lane_spacing)
+        if self.lane_x[-1] != max_x:
+            self.lane_x = np.append(self.lane_x, max_x)
+        # Lanes the car can cross while one row scrolls by, less one for the time spent lining up
+        steps_per_row = SCALED_TILE_HEIGHT * SIMULATION_TICK_RATE // BACKGROUND_SCROLL_SPEED_Y
+        self.reach = max(1, steps_per_row * PLAYER_CAR_SPEED // SIMULATION_TICK_RATE // lane_spacing - 1)
+        # reachable[lane]: the lanes within reach of it, clipped at the edges
+        lanes = np.arange(self.lane_x.size)
+        self.reachable = np.clip(lanes[:, None] + np.arange(-self.reach, self.reach + 1), 0, lanes[-1])
+        self.moves = np.abs(self.reachable - lanes[:, None])
+
+        # Rock extents for a collider without a LevelMap; with one, they come from the level
+        self.solid_spans = [mask_span(mask) if mask is not None else None
+                            for mask in game.rock_collider.solid_tile_masks]
+        self.rock_rows = {} # World row -> (its tile bytes, bool per lane: True where rocks leave room)
+        self.plan = {} # World row -> lane to be in by the time the car's top reaches that row
+        self.search = None
+        self.next_piece = None # Kind of the search's next piece of work
+        self.piece_ns = {} # Kind of piece -> recent slowest time one took, at most the whole budget
+
+        # Statistics
+        self.searches = 0
+        self.calls_over_budget = 0
+        self.last_call_us = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.keys()
+
+    def keys(self):
+        """Advances planning within the time budget and returns the keys to hold this frame."""
+        start = time.perf_counter_ns()
+        if self.game.game_over:
+            self.plan.clear()
+            self.search = None
+            return NO_KEYS
+
+        # Keep back the time steering took lately (at most a quarter of the budget), as it runs after planning
+        deadline = start + self.budget_ns - self.piece_ns.get("steer", 0)
+        now = start
+        while True:
+            if self.search is None:
+                self.search = self._search()
+                self.next_piece = next(self.search)
+            piece = self.next_piece
+            # Leave a piece that took longer lately than what's left for the next call. Estimates are
+            # capped at the budget, so a fresh call always has room for one piece and planning goes on.
+            if now + self.piece_ns.get(piece, 0) > deadline:
+                break
+            try:
+                self.next_piece = next(self.search)
+            except StopIteration:
+                self.search = None
+                self.searches += 1
+            previous, now = now, time.perf_counter_ns()
+            self.piece_ns[piece] = min(max(self.piece_ns.get(piece, 0), now - previous), self.budget_ns)
+            if self.search is None:
+                break # One finished search per call is plenty; the next starts on the next call
+        keys = self._steer()
+        steered = time.perf_counter_ns()
+        self.piece_ns["steer"] = min(max(self.piece_ns.get("steer", 0), steered - now), self.budget_ns // 4)
+        for piece, ns in self.piece_ns.items():
+            self.piece_ns[piece] = ns - ns // 128 # Forget a one-off slow piece after a while
+
+        elapsed = time.perf_counter_ns() - start
+        self.last_call_us = elapsed / 1000
+        if elapsed > self.budget_ns:
+            self.calls_over_budget += 1
+        return keys
+
+    # --- Planning ---
+    def _car_top(self):
+        game = self.game
+        return game.player_car.rect.y + game.background_scroll_y
+
+    def _rock_clear(self, row):
+        """Returns a bool per lane, True where the car fits between the rocks of a world row."""
+        game = self.game
+        tiles = game.world.row(row)
+        tile_bytes = tiles.tobytes()
+        cached = self.rock_rows.get(row)
+        if cached is not None and cached[0] == tile_bytes:
+            return cached[1]
+
+        # Extents of the same masks the collider uses for this row
+        collider = game.rock_collider
+        spans = self.solid_spans if collider.levels is None else collider.levels.tile_spans(row)
+        clear = np.ones(self.lane_x.size, dtype=bool)
+        car_left = self.lane_x + self.car_left
+        car_right = self.lane_x + self.car_right
+        last_col = (SCREEN_WIDTH - 1) // SCALED_TILE_WIDTH
+        for col, tile_id in enumerate(tiles[:last_col + 1].tolist()):
+            span = spans[tile_id]
+            if span is None:
+                continue
+            left = col * SCALED_TILE_WIDTH + span[0] - self.margin
+            right = col * SCALED_TILE_WIDTH + span[1] + self.margin
+            clear &= (car_right <= left) | (car_left >= right)
+
+        if len(self.rock_rows) > 4 * self.rows_ahead:
+            self.rock_rows.clear() # Rows behind the car are never read again
+        self.rock_rows[row] = (tile_bytes, clear)
+        return clear
+
+    def _traffic_blocked(self, top, enter, leave, npc_x, npc_y, npc_vy):
+        """Returns a (rows_ahead, lanes) bool array, True where one of the given NPC cars is in the way.
+
+        The car's top passes row j ahead between enter[j] and leave[j] steps
+        from now. An NPC car is alongside in that row if its offset from the
+        player at either end of that time, or in between, puts the two cars
+        side by side, and in the way of the lanes it overlaps.
+        """
+        traffic = self.game.traffic
+        # NPC y minus player top, at both ends of each row's time
+        offset = npc_y - top
+        closing = (npc_vy + BACKGROUND_SCROLL_SPEED_Y) / SIMULATION_TICK_RATE
+        at_enter = offset + np.outer(enter, closing)
+        at_leave = offset + np.outer(leave, closing)
+        alongside = ((np.minimum(at_enter, at_leave) < self.car_height + self.margin)
+                     & (np.maximum(at_enter, at_leave) > -traffic.car_height - self.margin))
+
+        npc_left = npc_x - self.margin
+        npc_right = npc_left + traffic.car_width + 2 * self.margin
+        overlaps = (np.less.outer(npc_left, self.lane_x + self.car_right)
+                    & np.greater.outer(npc_right, self.lane_x + self.car_left))
+        return np.dot(alongside, overlaps)
+
+    def _best_reachable(self, score, safe):
+        """For every lane, the best score among lanes reachable through safe lanes of this row."""
+        run = np.cumsum(~safe) # Lanes in one run of safe lanes share a number
+        reachable = safe[self.reachable] & (run[self.reachable] == run[:, None])
+        return np.where(reachable, score[self.reachable], 0).max(axis=1)
+
+    def _search(self):
+        """Generator that plans through the rows ahead, yielding the kind of each piece of work before doing it."""
+        yield "start"
+        top = self._car_top()
+        first_row = top // SCALED_TILE_HEIGHT
+        rows = [first_row - j for j in range(self.rows_ahead)]
+        # Steps until the car's top enters and leaves each row
+        row_tops = (first_row - np.arange(self.rows_ahead)) * SCALED_TILE_HEIGHT
+        scroll_per_step = BACKGROUND_SCROLL_SPEED_Y / SIMULATION_TICK_RATE
+        enter = np.maximum(0, top - (row_tops + SCALED_TILE_HEIGHT - 1)) / scroll_per_step
+        leave = np.maximum(0, top - row_tops) / scroll_per_step
+        # The NPC cars as they are now, at the same step as top
+        traffic = self.game.traffic
+        indices = np.flatnonzero(traffic.active)
+        npc_x, npc_y, npc_vy = traffic.x[indices], traffic.y[indices], traffic.vy[indices]
+
+        clear = {}
+        for row in range(first_row + 1, first_row - self.rows_ahead, -1):
+            yield "rocks"
+            clear[row] = self._rock_clear(row)
+        traffic_blocked = np.zeros((self.rows_ahead, self.lane_x.size), dtype=bool)
+        for i in range(0, indices.size, self.traffic_chunk):
+            yield "traffic"
+            chunk = slice(i, i + self.traffic_chunk)
+            traffic_blocked |= self._traffic_blocked(top, enter, leave, npc_x[chunk], npc_y[chunk], npc_vy[chunk])
+
+        # scores[j][lane]: rows the car survives starting in that lane of row j
+        safe = [None] * self.rows_ahead
+        scores = [None] * self.rows_ahead
+        score = np.zeros(self.lane_x.size, dtype=np.int64)
+        for j in reversed(range(self.rows_ahead)):
+            yield "scores"
+            safe[j] = clear[rows[j]] & clear[rows[j] + 1] & ~traffic_blocked[j]
+            score = np.where(safe[j], self._best_reachable(score, safe[j]) + 1, 0)
+            scores[j] = score
+
+        # Follow the scores from where the car is now, which may be a row or two further on
+        j = first_row - self._car_top() // SCALED_TILE_HEIGHT
+        if j >= self.rows_ahead - 1:
+            return
+        lane = int(np.abs(self.lane_x - self.game.player_car.rect.x).argmin())
+        plan = {}
+        for j in range(j, self.rows_ahead - 1):
+            yield "plan"
+            lane = self._next_lane(lane, safe[j], scores[j + 1])
+            plan[rows[j + 1]] = lane
+        self.plan = plan
+
+    def _next_lane(self, lane, safe, next_score):
+        """Picks the lane to steer to while crossing a row: the best next score, then the shortest move."""
+        candidates = self.reachable[lane]
+        if safe[lane]:
+            # Only lanes the car can sweep to without leaving the safe run it's in
+            run = np.cumsum(~safe)
+            allowed = safe[candidates] & (run[candidates] == run[lane])
+        else:
+            allowed = np.ones(candidates.size, dtype=bool) # Already in trouble; take the best way out
+        # Scores are at most rows_ahead, so one lane of score outweighs any difference in moves
+        value = np.where(allowed, next_score[candidates] * (2 * self.reach + 2) - self.moves[lane], -1)
+        return int(candidates[value.argmax()])
+
+    # --- Steering ---
+    def _steer(self):
+        car = self.game.player_car
+        row = self._car_top() // SCALED_TILE_HEIGHT
+        # Head for the lane of the row ahead while crossing this one
+        lane = self.plan.get(row - 1, self.plan.get(row))
+        if lane is None:
+            return NO_KEYS
+        target = int(self.lane_x[lane])
+        # Wide enough that one step can't jump across it
+        dead_zone = -(-PLAYER_CAR_SPEED // SIMULATION_TICK_RATE) // 2 + 1
+        if car.rect.x < target - dead_zone:
+            return RIGHT_KEYS
+        if car.rect.x > target + dead_zone:
+            return LEFT_KEYS
+        return NO_KEYS
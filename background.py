@@ -0,0 +1,135 @@
+from collections import OrderedDict
+
+import pygame
+
+from settings import WHITE, BACKGROUND_STRIP_ROWS, BACKGROUND_MAX_STRIPS
+
+
+class BackgroundRenderer:
+    """Draws the scrolling background from cached, pre-composed strips.
+
+    Each strip is a full-width surface holding BACKGROUND_STRIP_ROWS rows of
+    the world, built the first time it is needed. A frame is then a handful
+    of large blits (one per strip and horizontal wrap) instead of one blit
+    per visible tile. At most max_strips are cached, least recently used
+    first out. Call invalidate_cell() after changing a world tile so the
+    strip holding it is rebuilt on the next draw.
+
+    tile_images is indexed by the tile IDs stored in the world; offsets
+    passed to draw() are in pixels of those images. If a LevelMap is given
+    as levels, each row is drawn with its own level's tiles instead (at the
+    same size), and strips of animated levels are cached once per
+    animation frame.
+    """
+    def __init__(self, tile_images, strip_rows=BACKGROUND_STRIP_ROWS, max_strips=BACKGROUND_MAX_STRIPS, levels=None):
+        self.tile_images = tile_images
+        self.tile_width, self.tile_height = tile_images[0].get_size() if tile_images else (0, 0)
+        self.strip_rows = strip_rows
+        self.max_strips = max_strips
+        self.levels = levels
+        self.world = None
+        self.strips = OrderedDict() # Strip index -> {animation frame: surface}
+
+    def set_world(self, world):
+        """Switches to a new world and drops every cached strip."""
+        self.world = world
+        self.strips.clear()
+
+    def invalidate_cell(self, row, col):
+        """Marks the strip holding the world cell at (row, col) as stale."""
+        self.strips.pop(row // self.strip_rows, None)
+
+    def invalidate_all(self):
+        self.strips.clear()
+
+    def _build_strip(self, strip_index, animation_frame):
+        world = self.world
+        first_row = strip_index * self.strip_rows
+        rows = [world.row(first_row + r).tolist() for r in range(self.strip_rows)]
+        levels = self.levels
+        if levels is None:
+            row_images = [self.tile_images] * self.strip_rows
+        else:
+            row_images = [levels.tile_images(first_row + r, animation_frame) for r in range(self.strip_rows)]
+        tile_width, tile_height = self.tile_width, self.tile_height
+
+        # One spare column keeps the row pitch off a multiple of 16 bytes. SDL copies
+        # 16-byte aligned rows with streaming stores, which made every fourth
+        # horizontal scroll position several times slower to draw.
+        strip = pygame.Surface((world.num_cols * tile_width + 1, self.strip_rows * tile_height))
+        if pygame.display.get_surface() is not None:
+            strip = strip.convert() # Match the display format for fast blits
+        strip.fill(WHITE) # Same backdrop the per-frame screen clear gives transparent tile pixels
+        strip.blits(
+            [(tile_images[tile_id], (c * tile_width, r * tile_height))
+             for r, (row, tile_images) in enumerate(zip(rows, row_images))
+             for c, tile_id in enumerate(row)],
+            doreturn=False,
+        )
+        return strip
+
+    def _strip(self, strip_index, animation_step):
+        frames = self.strips.get(strip_index)
+        if frames is None:
+            frames = self.strips[strip_index] = {}
+            while len(self.strips) > self.max_strips:
+                self.strips.popitem(last=False)
+        else:
+            self.strips.move_to_end(strip_index)
+
+        animation_frame = 0
+        if self.levels is not None and animation_step:
+            # A strip spans at most two levels; still ones have a single frame
+            first_row = strip_index * self.strip_rows
+            frame_count = max(self.levels.frame_count(first_row), self.levels.frame_count(first_row + self.strip_rows - 1))
+            animation_frame = animation_step % frame_count
+        strip = frames.get(animation_frame)
+        if strip is None:
+            strip = frames[animation_frame] = self._build_strip(strip_index, animation_frame)
+        return strip
+
+    def draw(self, surface, world, camera_x_offset, scroll_y_offset, animation_step=0):
+        """Draws the scrolling background, wrapping the world horizontally.
+
+        animation_step picks the frame of animated level tiles.
+        """
+        blit_sequence = self.blit_sequence(surface.get_size(), world, camera_x_offset, scroll_y_offset, animation_step)
+        if blit_sequence is None:
+            surface.fill(WHITE) # Fallback to white if there is nothing to draw
+            return
+        surface.blits(blit_sequence, doreturn=False)
+
+    def blit_sequence(self, surface_size, world, camera_x_offset, scroll_y_offset, animation_step=0):
+        """Returns the strip blits that cover a surface of surface_size, already clipped to it.
+
+        Returns None if there is no world or no tiles to draw.
+        """
+        if world is not self.world:
+            self.set_world(world)
+
+        if world is None or world.num_cols == 0 or not self.tile_images:
+            return None
+
+        world_width = world.num_cols * self.tile_width
+        strip_height = self.strip_rows * self.tile_height
+        surface_width, surface_height = surface_size
+
+        start_x = camera_x_offset % world_width
+
+        blit_sequence = []
+        screen_y = 0
+        while screen_y < surface_height:
+            world_y = scroll_y_offset + screen_y
+            strip_index = world_y // strip_height
+            strip = self._strip(strip_index, animation_step)
+            y_in_strip = world_y - strip_index * strip_height
+            height = min(strip_height - y_in_strip, surface_height - screen_y)
+
+            screen_x = 0
+            while screen_x < surface_width:
+                world_x = (start_x + screen_x) % world_width
+                width = min(world_width - world_x, surface_width - screen_x)
+                blit_sequence.append((strip, (screen_x, screen_y), (world_x, y_in_strip, width, height)))
+                screen_x += width
+            screen_y += height
+        return blit_sequence
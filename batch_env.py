@@ -0,0 +1,202 @@
+"""Vectorized batch environment: many independent games stepped in lockstep.
+
+Every per-game value that GameCore keeps as an attribute is a NumPy array
+here, one entry per environment, and step() applies the same rules as
+GameCore.update() to all of them with array operations. Unlike GameCore's
+endless world, the environments share one finite tile map that wraps in
+both directions, so it can live in a single array.
+
+Actions are key bitmasks, so 0 is no input, ACTION_LEFT holds A,
+ACTION_RIGHT holds D and both bits hold both keys (which cancel out).
+"""
+import numpy as np
+
+from settings import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, SCALED_TILE_WIDTH, SCALED_TILE_HEIGHT,
+    PLAYER_CAR_SPEED, ROCK_TILE_INDEX, SAFE_TILE_INDEX, LAYOUT_TILES_HIGH, LAYOUT_TILES_WIDE,
+    BACKGROUND_SCROLL_SPEED_Y, INVINCIBILITY_DURATION, BLINK_INTERVAL, FIXED_DT,
+)
+from tilemap import SOLID_TILES, generate_tile_map
+from timestep import step_distance
+
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+
+STEP_REWARD = 1.0 # Reward for every frame survived
+CRASH_REWARD = -100.0 # Reward for the frame the car hits a rock
+
+OBS_ROWS_AHEAD = 6 # Tile rows above the car included in the observation
+OBS_COLS_AROUND = 3 # Tile columns on each side of the car included in the observation
+
+
+def build_overlap_table(car_mask, tile_mask):
+    """Precomputes car/tile mask overlap for every relative offset.
+
+    table[dx + tile_width - 1, dy + tile_height - 1] is True if the tile at
+    offset (dx, dy) from the car's top-left overlaps it, which is exactly
+    what car_mask.overlap(tile_mask, (dx, dy)) reports.
+    """
+    car_width, car_height = car_mask.get_size()
+    tile_width, tile_height = tile_mask.get_size()
+    table = np.zeros((car_width + tile_width - 1, car_height + tile_height - 1), dtype=bool)
+    for dx in range(-(tile_width - 1), car_width):
+        for dy in range(-(tile_height - 1), car_height):
+            table[dx + tile_width - 1, dy + tile_height - 1] = car_mask.overlap(tile_mask, (dx, dy)) is not None
+    return table
+
+
+class BatchCarEnv:
+    """Steps num_envs games at once over a shared tile map.
+
+    tile_map is a uint8 array of tile IDs; by default one of
+    LAYOUT_TILES_HIGH x LAYOUT_TILES_WIDE is generated from seed.
+    """
+    def __init__(self, num_envs, assets, tile_map=None, seed=None, dt=FIXED_DT):
+        self.num_envs = num_envs
+        self.dt = dt
+
+        if tile_map is None:
+            tile_map = generate_tile_map(LAYOUT_TILES_HIGH, LAYOUT_TILES_WIDE, np.random.default_rng(seed))
+        self.tile_map = np.array(tile_map, dtype=np.uint8) # Own copy, the safe zone is written into it
+        self.num_rows, self.num_cols = self.tile_map.shape
+
+        self.car_width, self.car_height = assets.player_car_mask.get_size()
+        self.start_x = (SCREEN_WIDTH - self.car_width) // 2
+        self.car_y = SCREEN_HEIGHT - self.car_height - 10 # The car never moves vertically on screen
+
+        # Collision data: which map cells are rocks and how the car overlaps a rock at each offset
+        self.solid_map = SOLID_TILES[self.tile_map]
+        self.overlap_table = build_overlap_table(assets.player_car_mask, assets.desert_tile_masks[ROCK_TILE_INDEX])
+        self._clear_safe_zone()
+
+        # Per-environment state
+        self.player_x = np.full(num_envs, self.start_x, dtype=np.int64)
+        self.camera_x = np.zeros(num_envs, dtype=np.int64)
+        self.background_scroll_y = np.zeros(num_envs, dtype=np.int64)
+        self.player_invincible = np.zeros(num_envs, dtype=bool)
+        self.invincibility_timer = np.zeros(num_envs, dtype=np.float64)
+        self.blink_timer = np.zeros(num_envs, dtype=np.float64)
+        self.player_visible = np.ones(num_envs, dtype=bool)
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+
+        self.reset()
+
+    def _clear_safe_zone(self):
+        """Clears rocks from the 3x3 cells around the starting position, like GameCore.reset().
+
+        The start position is the same for every game, so on the shared map
+        this only needs to happen once.
+        """
+        center_col = (self.start_x + self.car_width // 2) // SCALED_TILE_WIDTH
+        center_row = (self.car_y + self.car_height // 2) // SCALED_TILE_HEIGHT
+        rows = np.arange(center_row - 1, center_row + 2) % self.num_rows
+        cols = np.arange(center_col - 1, center_col + 2) % self.num_cols
+        zone = np.ix_(rows, cols)
+        self.tile_map[zone] = np.where(self.solid_map[zone], SAFE_TILE_INDEX, self.tile_map[zone])
+        self.solid_map[zone] = False
+
+    def reset(self, env_mask=None):
+        """Resets the selected environments (all by default) and returns observations.
+
+        Like GameCore.reset(), this grants invincibility but leaves the
+        background scroll where it was.
+        """
+        if env_mask is None:
+            env_mask = np.ones(self.num_envs, dtype=bool)
+        self.player_x[env_mask] = self.start_x
+        self.camera_x[env_mask] = 0
+        self.player_invincible[env_mask] = True
+        self.invincibility_timer[env_mask] = 0
+        self.blink_timer[env_mask] = 0
+        self.player_visible[env_mask] = True
+        self.episode_steps[env_mask] = 0
+        return self.observe()
+
+    def step(self, actions):
+        """Advances every environment one frame.
+
+        Returns (observations, rewards, dones). Environments that crashed
+        this frame report done=True and are reset before the observations
+        are taken, so the batch never has to be stepped around dead games.
+        """
+        actions = np.asarray(actions)
+
+        self.episode_steps += 1
+
+        # Movement, as in PlayerCar.update()
+        distance = step_distance(PLAYER_CAR_SPEED, self.episode_steps)
+        move = np.where(actions & ACTION_LEFT, -distance, 0) + np.where(actions & ACTION_RIGHT, distance, 0)
+        np.clip(self.player_x + move, 0, SCREEN_WIDTH - self.car_width, out=self.player_x)
+
+        self.camera_x[:] = self.player_x + self.car_width // 2 - SCREEN_WIDTH // 2
+        self.background_scroll_y -= step_distance(BACKGROUND_SCROLL_SPEED_Y, self.episode_steps)
+
+        # Invincibility and blinking
+        invincible = self.player_invincible
+        self.invincibility_timer[invincible] += self.dt
+        expired = invincible & (self.invincibility_timer >= INVINCIBILITY_DURATION)
+        blinking = invincible & ~expired
+        self.blink_timer[blinking] += self.dt
+        toggle = blinking & (self.blink_timer >= BLINK_INTERVAL)
+        self.player_visible[toggle] = ~self.player_visible[toggle]
+        self.blink_timer[toggle] = 0
+        self.player_invincible[expired] = False
+        self.player_visible[~self.player_invincible] = True
+
+        crashed = ~self.player_invincible & self._rock_collisions()
+
+        rewards = np.where(crashed, CRASH_REWARD, STEP_REWARD)
+        dones = crashed.copy()
+        if dones.any():
+            self.reset(dones)
+        return self.observe(), rewards, dones
+
+    def _rock_collisions(self):
+        """Returns a bool array marking environments whose car touches a rock."""
+        collided = np.zeros(self.num_envs, dtype=bool)
+
+        # Car top-left in world coordinates, the same as GameCore._check_collision()
+        left = SCREEN_WIDTH // 2 - self.car_width // 2 + self.camera_x
+        top = self.car_y + self.background_scroll_y
+        first_col = left // SCALED_TILE_WIDTH
+        first_row = top // SCALED_TILE_HEIGHT
+
+        # The car covers at most this many cells in each direction
+        cells_wide = (self.car_width - 1) // SCALED_TILE_WIDTH + 2
+        cells_high = (self.car_height - 1) // SCALED_TILE_HEIGHT + 2
+        for row_step in range(cells_high):
+            row = first_row + row_step
+            dy = row * SCALED_TILE_HEIGHT - top
+            for col_step in range(cells_wide):
+                col = first_col + col_step
+                dx = col * SCALED_TILE_WIDTH - left
+                in_reach = (dx < self.car_width) & (dy < self.car_height)
+                solid = self.solid_map[row % self.num_rows, col % self.num_cols]
+                overlap = self.overlap_table[
+                    np.minimum(dx + SCALED_TILE_WIDTH - 1, self.overlap_table.shape[0] - 1),
+                    np.minimum(dy + SCALED_TILE_HEIGHT - 1, self.overlap_table.shape[1] - 1),
+                ]
+                collided |= in_reach & solid & overlap
+        return collided
+
+    def observe(self):
+        """Returns a dict of per-environment observation arrays.
+
+        "rocks_ahead" holds the rock cells in the OBS_ROWS_AHEAD rows above
+        the car's cell and OBS_COLS_AROUND columns either side of it, with
+        the nearest row last, as uint8 0/1 values.
+        """
+        car_col = (SCREEN_WIDTH // 2 + self.camera_x) // SCALED_TILE_WIDTH
+        car_row = (self.car_y + self.car_height // 2 + self.background_scroll_y) // SCALED_TILE_HEIGHT
+        row_offsets = np.arange(-OBS_ROWS_AHEAD, 1)
+        col_offsets = np.arange(-OBS_COLS_AROUND, OBS_COLS_AROUND + 1)
+        rows = (car_row[:, None] + row_offsets[None, :]) % self.num_rows
+        cols = (car_col[:, None] + col_offsets[None, :]) % self.num_cols
+        rocks_ahead = self.solid_map[rows[:, :, None], cols[:, None, :]].astype(np.uint8)
+        return {
+            "player_x": self.player_x.copy(),
+            "background_scroll_y": self.background_scroll_y.copy(),
+            "player_invincible": self.player_invincible.copy(),
+            "player_visible": self.player_visible.copy(),
+            "rocks_ahead": rocks_ahead,
+        }
@@ -0,0 +1,272 @@
+"""Headless benchmark suite with regression thresholds.
+
+Each scenario times one piece of per-frame or load-time work on the dummy
+video driver and reports microseconds per call (the median of several
+rounds). Scenarios that scroll loop over a fixed stretch of road that is
+drawn once before timing starts, so every call does the same work, however
+many calls a round makes. Save a baseline on a known-good tree, then compare later runs
+against it; the run fails if any scenario got slower than the allowed
+percentage. Usage:
+
+    python -m bench --save-baseline
+    python -m bench                      # compare with bench_baseline.json
+    python -m bench --only background --threshold 10
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from settings import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, PIXEL_SCALE, BACKGROUND_SCROLL_SPEED_Y, SIMULATION_TICK_RATE,
+    DESERT_SPRITESHEET_PATH, TILE_SPRITE_WIDTH, TILE_SPRITE_HEIGHT,
+    SCALED_TILE_WIDTH, SCALED_TILE_HEIGHT, NUM_TILE_TYPES, LAYOUT_TILES_WIDE, BACKGROUND_STRIP_ROWS,
+    BENCH_BASELINE_PATH, BENCH_REGRESSION_PERCENT, BENCH_ROUNDS,
+)
+from game_core import GameAssets, GameCore, KeyState, load_image, extract_sprite, load_game_sprites
+from headless import init_headless
+from render import PixelScaler
+from tilemap import generate_tile_map
+
+WINDOW_SIZES = ((800, 600), (1280, 720), (1920, 1080), (2560, 1440))
+LAYOUT_ROWS = (18, 180, 1800, 18000)
+OBSTACLE_COUNTS = (0, 50, 200, 500)
+TARGET_ROUND_SECONDS = 0.05 # Each round runs enough calls to take about this long
+# Scrolling scenarios repeat this stretch of road: one cached background strip, so
+# after the first pass no call rebuilds strips or loads textures
+SCROLL_CYCLE = BACKGROUND_STRIP_ROWS * SCALED_TILE_HEIGHT
+SCROLL_STEP = max(1, BACKGROUND_SCROLL_SPEED_Y // SIMULATION_TICK_RATE) # Whole pixels the road scrolls per step
+
+
+def time_per_call(func, rounds=BENCH_ROUNDS):
+    """Returns the median seconds per call of func over several timed rounds.
+
+    The median ignores the odd round disturbed by the rest of the system
+    without rewarding a lucky one, so it is the most repeatable number to
+    compare between runs.
+    """
+    func() # Warm up caches before timing
+
+    # Pick a call count so one round takes about TARGET_ROUND_SECONDS
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= TARGET_ROUND_SECONDS / 4 or number >= 1 << 20:
+            break
+        number *= 4
+    number = max(1, int(number * TARGET_ROUND_SECONDS / max(elapsed, 1e-9)))
+
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+    return float(np.median(per_call))
+
+
+def wrap_scroll(game, start_scroll_y):
+    """Moves the road back by SCROLL_CYCLE once it has scrolled that far past start_scroll_y.
+
+    The traffic moves back with it, so the picture stays the same.
+    """
+    if start_scroll_y - game.background_scroll_y >= SCROLL_CYCLE:
+        game.background_scroll_y += SCROLL_CYCLE
+        game.previous_background_scroll_y += SCROLL_CYCLE
+        game.traffic.y[game.traffic.active] += SCROLL_CYCLE
+        game.traffic.previous_y[game.traffic.active] += SCROLL_CYCLE # The broadphase grid is rebuilt by the next update
+
+def warm_up_cycle(func):
+    """Calls func over one whole SCROLL_CYCLE, so the strips and textures it needs are cached."""
+    for _ in range(SCROLL_CYCLE // SCROLL_STEP + 1):
+        func()
+
+
+# --- Scenarios ---
+# Each yields (name, func) pairs; func does one unit of work per call.
+def background_scenarios(assets):
+    """Background drawing at the native size of several window sizes, scrolling every call."""
+    for width, height in WINDOW_SIZES:
+        game = GameCore(assets, seed=1, verbose=False)
+        surface = pygame.Surface((width // PIXEL_SCALE, height // PIXEL_SCALE)).convert()
+        renderer = game.background_renderer
+        start_scroll_y = game.background_scroll_y
+
+        def draw_background(game=game, surface=surface, renderer=renderer, start_scroll_y=start_scroll_y):
+            game.background_scroll_y -= SCROLL_STEP
+            wrap_scroll(game, start_scroll_y)
+            renderer.draw(surface, game.world, game.camera_x // PIXEL_SCALE, game.background_scroll_y // PIXEL_SCALE)
+        warm_up_cycle(draw_background)
+        yield f"background[{width}x{height}]", draw_background
+
+def present_scenarios(assets):
+    """The one upscale from the native frame to windows of several sizes."""
+    native_surface = GameCore(assets, seed=1, verbose=False).draw_native()
+    for width, height in WINDOW_SIZES:
+        window = pygame.Surface((width, height)).convert()
+        scaler = PixelScaler(native_surface.get_size())
+        yield f"present[{width}x{height}]", lambda scaler=scaler, window=window: scaler.present(native_surface, window)
+
+def collision_scenarios(assets):
+    """The player's rock and traffic checks, the collision pass of GameCore.update()."""
+    game = GameCore(assets, seed=1, verbose=False)
+    positions = [(x, -y) for y in range(0, 64 * SCALED_TILE_HEIGHT, 7) for x in range(0, SCREEN_WIDTH, 37)]
+    position_iter = iter(())
+
+    def next_position():
+        nonlocal position_iter
+        try:
+            return next(position_iter)
+        except StopIteration:
+            position_iter = iter(positions)
+            return next(position_iter)
+
+    def rock_collision():
+        left, top = next_position()
+        game.rock_collider.collides(game.world, left, top)
+    yield "collision[rocks]", rock_collision
+
+    for count in OBSTACLE_COUNTS[1:]:
+        traffic_game = GameCore(assets, seed=1, verbose=False)
+        fill_traffic(traffic_game, count)
+        left = (SCREEN_WIDTH - SCALED_TILE_WIDTH) // 2
+        top = traffic_game.player_car.rect.y + traffic_game.background_scroll_y
+        yield (f"collision[{count} cars]",
+               lambda game=traffic_game, left=left, top=top: game.traffic.collides(game.assets.player_car_mask, left, top))
+
+def layout_scenarios(assets):
+    """Tile map generation at growing map sizes."""
+    rng = np.random.default_rng(1)
+    for rows in LAYOUT_ROWS:
+        yield f"layout[{rows}x{LAYOUT_TILES_WIDE}]", lambda rows=rows: generate_tile_map(rows, LAYOUT_TILES_WIDE, rng)
+
+def asset_scenarios(assets):
+    """Sprite extraction and scaling, and the whole asset load with and without the sprite cache."""
+    desert_spritesheet = load_image(DESERT_SPRITESHEET_PATH)
+
+    def extract_and_scale_tiles():
+        for i in range(NUM_TILE_TYPES):
+            tile_rect = (i * TILE_SPRITE_WIDTH, 0, TILE_SPRITE_WIDTH, TILE_SPRITE_HEIGHT)
+            extract_sprite(desert_spritesheet, tile_rect, (SCALED_TILE_WIDTH, SCALED_TILE_HEIGHT))
+    yield "assets[extract+scale tiles]", extract_and_scale_tiles
+    yield "assets[load all]", GameAssets # Warm: sprites come from the cache after the first call
+    yield "assets[load all, no cache]", lambda: GameAssets(load_game_sprites(cache_dir=None))
+
+def frame_scenarios(assets):
+    """A full frame (update, draw and upscale) with N NPC cars on screen."""
+    window = pygame.display.get_surface()
+    no_keys = KeyState()
+    for count in OBSTACLE_COUNTS:
+        game = GameCore(assets, seed=1, verbose=False)
+        fill_traffic(game, count)
+        start_scroll_y = game.background_scroll_y
+
+        def frame(game=game, start_scroll_y=start_scroll_y):
+            # dt 0 keeps the invincibility from running out and stops new spawns,
+            # so the car count stays at N and the run never ends
+            game.update(no_keys, 0)
+            wrap_scroll(game, start_scroll_y)
+            game.draw(window)
+        warm_up_cycle(frame)
+        yield f"frame[{count} cars]", frame
+
+SCENARIO_GROUPS = {
+    "background": background_scenarios,
+    "present": present_scenarios,
+    "collision": collision_scenarios,
+    "layout": layout_scenarios,
+    "assets": asset_scenarios,
+    "frame": frame_scenarios,
+}
+
+
+def fill_traffic(game, count):
+    """Places `count` NPC cars across the screen, moving with the road so they stay in view."""
+    traffic = game.traffic
+    rng = np.random.default_rng(count)
+    slots = np.arange(count)
+    traffic.x[slots] = rng.integers(0, SCREEN_WIDTH - traffic.car_width + 1, count)
+    traffic.y[slots] = game.background_scroll_y + rng.integers(0, SCREEN_HEIGHT - traffic.car_height + 1, count)
+    traffic.vy[slots] = -BACKGROUND_SCROLL_SPEED_Y
+    traffic.kind[slots] = rng.integers(0, len(traffic.car_images_native), count)
+    traffic.active[slots] = True
+    traffic.restore(traffic.snapshot()) # Rebuilds the broadphase grid
+
+
+def run_benchmarks(groups=None):
+    """Runs the selected scenario groups and returns {scenario: microseconds per call}."""
+    assets = GameAssets()
+    results = {}
+    for group_name, scenarios in SCENARIO_GROUPS.items():
+        if groups and group_name not in groups:
+            continue
+        for name, func in scenarios(assets):
+            results[name] = time_per_call(func) * 1e6
+            print(f"{name:<32}{results[name]:>12.1f} us")
+    return results
+
+
+def compare(results, baseline, threshold_percent):
+    """Returns (name, baseline_us, current_us, change_percent) for every scenario slower than allowed."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or previous <= 0:
+            continue
+        change = (current - previous) / previous * 100
+        if change > threshold_percent:
+            regressions.append((name, previous, current, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time headless game scenarios and compare them with a baseline.")
+    parser.add_argument("--baseline", default=BENCH_BASELINE_PATH, help="JSON baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=BENCH_REGRESSION_PERCENT,
+                        help="fail if a scenario is more than this many percent slower than the baseline")
+    parser.add_argument("--only", action="append", choices=sorted(SCENARIO_GROUPS),
+                        help="run only this scenario group (can be repeated)")
+    args = parser.parse_args(argv)
+
+    init_headless()
+    results = run_benchmarks(args.only)
+    pygame.quit()
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "pygame": pygame.version.ver,
+                "machine": platform.machine(),
+                "us_per_call": results,
+            }, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["us_per_call"]
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 2 # Nothing was compared, which a CI gate must not take for a pass
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, previous, current, change in regressions:
+        print(f"REGRESSION {name}: {previous:.1f} us -> {current:.1f} us (+{change:.0f}%)")
+    if regressions:
+        print(f"{len(regressions)} scenario(s) more than {args.threshold:g}% slower than {args.baseline}")
+        return 1
+    print(f"All {len(results)} scenarios within {args.threshold:g}% of {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
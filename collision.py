@@ -0,0 +1,63 @@
+import pygame
+
+from settings import SCALED_TILE_WIDTH, SCALED_TILE_HEIGHT
+from tilemap import SOLID_TILES
+
+
+def build_tile_mask(tile_image, ground_color=None):
+    """Builds a collision mask for a tile, leaving out plain ground pixels.
+
+    Desert tiles are fully opaque, so an alpha mask alone would cover the
+    whole tile. Pixels matching ground_color (the sand of the plain tile)
+    are removed so only the drawn detail, e.g. the rock itself, is solid.
+    """
+    mask = pygame.mask.from_surface(tile_image)
+    if ground_color is not None:
+        ground_mask = pygame.mask.from_threshold(tile_image, ground_color, (1, 1, 1, 255))
+        mask.erase(ground_mask, (0, 0))
+    return mask
+
+
+def mask_span(mask):
+    """Returns the (left, right) x range of a mask's set pixels, or None if it has none."""
+    rects = mask.get_bounding_rects()
+    if not rects:
+        return None
+    return min(rect.left for rect in rects), max(rect.right for rect in rects)
+
+
+class RockCollider:
+    """Pixel-accurate collision between the player car and rock tiles.
+
+    A check only looks up the one to four world cells under the car's rect,
+    so its cost does not depend on the screen size.
+    """
+    def __init__(self, car_mask, tile_masks, levels=None):
+        """tile_masks is indexed by tile ID; only the masks of solid tiles are used.
+
+        If a LevelMap is given as levels, each row's masks come from its
+        level's theme instead.
+        """
+        self.car_mask = car_mask
+        self.car_width, self.car_height = car_mask.get_size()
+        # Mask per tile ID, None for tiles the car can drive over
+        self.solid_tile_masks = [mask if SOLID_TILES[tile_id] else None for tile_id, mask in enumerate(tile_masks)]
+        self.levels = levels
+
+    def collides(self, world, left, top):
+        """Returns True if the car with its top-left at world (left, top) touches a rock."""
+        first_col = left // SCALED_TILE_WIDTH
+        last_col = (left + self.car_width - 1) // SCALED_TILE_WIDTH
+        first_row = top // SCALED_TILE_HEIGHT
+        last_row = (top + self.car_height - 1) // SCALED_TILE_HEIGHT
+
+        for row in range(first_row, last_row + 1):
+            solid_tile_masks = self.solid_tile_masks if self.levels is None else self.levels.tile_masks(row)
+            for col in range(first_col, last_col + 1):
+                mask = solid_tile_masks[world.tile_at(row, col)]
+                if mask is None:
+                    continue
+                offset = (col * SCALED_TILE_WIDTH - left, row * SCALED_TILE_HEIGHT - top)
+                if self.car_mask.overlap(mask, offset):
+                    return True
+        return False
@@ -0,0 +1,488 @@
+import math
+import random
+
+import numpy as np
+import pygame
+
+from asset_pipeline import AssetPipeline
+from background import BackgroundRenderer
+from collision import RockCollider, build_tile_mask
+from hud import Hud, PANEL_RECTS
+from levels import LevelMap, THEMES, first_level_jobs
+from profiler import FrameProfiler
+from render import PixelScaler, RenderQueue, LAYER_BACKGROUND, LAYER_TRAFFIC, LAYER_PLAYER, LAYER_HUD
+from textures import TextureCache
+from timestep import step_distance, elapsed_ms
+from tilemap import SOLID_TILES
+from traffic import TrafficSystem
+from world import ChunkedWorld
+from settings import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, WHITE, BLACK, RED,
+    PIXEL_SCALE, NATIVE_WIDTH, NATIVE_HEIGHT, GAME_OVER_FONT_SIZE, RESTART_QUIT_FONT_SIZE,
+    PLAYER_COLOR_SPRITESHEET_PATHS, CAR_SPRITE_WIDTH, CAR_SPRITE_HEIGHT,
+    SCALED_CAR_WIDTH, SCALED_CAR_HEIGHT, PLAYER_CAR_SPEED,
+    SCALED_TILE_WIDTH, SCALED_TILE_HEIGHT, SAFE_TILE_INDEX,
+    BACKGROUND_SCROLL_SPEED_Y, INVINCIBILITY_DURATION, BLINK_INTERVAL,
+    NPC_CARS_SPRITESHEET_PATH, NUM_NPC_CAR_TYPES, LEVEL_ANIMATION_INTERVAL, ASSET_CACHE_DIR,
+    SIMULATION_TICK_RATE, HUD_DIGITS_PATH, HUD_DAMAGE_INDICATOR_PATH, HUD_FUEL_BAR_PATH, HUD_PANEL_PATH,
+    HUD_GLYPH_SIZE,
+)
+
+
+# --- Asset Loading Functions ---
+def load_font(font_name, size):
+    """Loads a font and returns the font object."""
+    try:
+        return pygame.font.Font(font_name, size)
+    except pygame.error as e:
+        print(f"Unable to load font {font_name}: {e}")
+        return pygame.font.Font(None, size) # Fallback to default system font
+
+def load_image(path, convert_alpha=True):
+    """Loads an image and optionally converts it with alpha transparency."""
+    try:
+        image = pygame.image.load(path)
+        if convert_alpha:
+            return image.convert_alpha()
+        return image.convert()
+    except pygame.error as e:
+        print(f"Unable to load image {path}: {e}")
+        return None
+
+def extract_sprite(spritesheet, rect, scale_to=None):
+    """Extracts a sprite from a spritesheet, optionally scales it."""
+    if spritesheet is None:
+        return None
+    try:
+        sprite = spritesheet.subsurface(pygame.Rect(rect))
+        if scale_to:
+            sprite = pygame.transform.scale(sprite, scale_to)
+        return sprite
+    except pygame.error as e:
+        print(f"Unable to extract sprite from rect {rect}: {e}")
+        # Create a placeholder surface if extraction fails
+        placeholder_width = scale_to[0] if scale_to else rect[2]
+        placeholder_height = scale_to[1] if scale_to else rect[3]
+        placeholder_sprite = pygame.Surface((placeholder_width, placeholder_height))
+        placeholder_sprite.fill(BLACK) # Fill with a default color
+        return placeholder_sprite
+
+
+def sprite_jobs():
+    """Returns the asset pipeline jobs for every sprite GameAssets needs, by name."""
+    car_rect = (0, 0, CAR_SPRITE_WIDTH, CAR_SPRITE_HEIGHT)
+    # Each NPC car type facing up, then facing down
+    npc_rects = [(column * CAR_SPRITE_WIDTH, car_type * CAR_SPRITE_HEIGHT, CAR_SPRITE_WIDTH, CAR_SPRITE_HEIGHT)
+                 for car_type in range(NUM_NPC_CAR_TYPES) for column in (0, 2)]
+
+    jobs = {f"player_car_{i}": (path, [car_rect], 1) for i, path in enumerate(PLAYER_COLOR_SPRITESHEET_PATHS)}
+    jobs.update(first_level_jobs()) # Later levels load in the background while driving
+    jobs["npc_cars"] = (NPC_CARS_SPRITESHEET_PATH, npc_rects, 1)
+    jobs["npc_cars_scaled"] = (NPC_CARS_SPRITESHEET_PATH, npc_rects, PIXEL_SCALE)
+    glyph_rects = [(i * HUD_GLYPH_SIZE, 0, HUD_GLYPH_SIZE, HUD_GLYPH_SIZE) for i in range(10)]
+    jobs["hud_digits"] = (HUD_DIGITS_PATH, glyph_rects, 1)
+    jobs["hud_damage_indicator"] = (HUD_DAMAGE_INDICATOR_PATH, glyph_rects[:2], 1)
+    jobs["hud_fuel_bar"] = (HUD_FUEL_BAR_PATH, [(0, 0, 16, 56)], 1)
+    jobs["hud_panel"] = (HUD_PANEL_PATH, PANEL_RECTS, 1)
+    return jobs
+
+def load_game_sprites(cache_dir=ASSET_CACHE_DIR):
+    """Runs sprite_jobs() on the asset pipeline and waits for the result."""
+    pipeline = AssetPipeline(cache_dir)
+    sprites = pipeline.load(sprite_jobs()).result()
+    pipeline.shutdown()
+    return sprites
+
+def placeholder_sprites(count, size, color):
+    """Plain surfaces standing in for the sprites of a sheet that failed to load."""
+    sprites = []
+    for _ in range(count):
+        sprite = pygame.Surface(size)
+        sprite.fill(color)
+        sprites.append(sprite)
+    return sprites
+
+
+class GameAssets:
+    """Fonts and sprites shared by every game instance.
+
+    Sprites come in two sizes: native (the spritesheet's own pixels), which
+    is what gets drawn, and scaled by PIXEL_SCALE, which matches the game
+    coordinates and is used for rects and collision masks.
+
+    sprites is the result of loading sprite_jobs() on an AssetPipeline;
+    main.py does that behind a loading screen. Without it the sprites are
+    loaded here, which is what headless runs and tools do. Either way
+    loading needs a display mode to be set (for convert_alpha), so build
+    this after pygame.display.set_mode(), either on a real window or on
+    the dummy video driver in headless mode.
+    """
+    def __init__(self, sprites=None):
+        if sprites is None:
+            sprites = load_game_sprites()
+
+        # Fonts, and the game over text rendered once with them (no antialiasing: it's upscaled with the pixel art)
+        self.game_over_font = load_font(None, GAME_OVER_FONT_SIZE)
+        self.restart_quit_font = load_font(None, RESTART_QUIT_FONT_SIZE)
+        self.game_over_text = self.game_over_font.render('Game Over', False, RED)
+        self.restart_quit_text = self.restart_quit_font.render('Press R to Restart or Q to Quit', False, BLACK)
+
+        # Car images, one per player color; single player drives the first (red) one
+        car_size = (CAR_SPRITE_WIDTH, CAR_SPRITE_HEIGHT)
+        self.player_car_images_native = [(sprites[f"player_car_{i}"] or placeholder_sprites(1, car_size, BLACK))[0]
+                                         for i in range(len(PLAYER_COLOR_SPRITESHEET_PATHS))]
+        self.player_car_image_native = self.player_car_images_native[0]
+        self.scaled_player_car_image = pygame.transform.scale(self.player_car_image_native, (SCALED_CAR_WIDTH, SCALED_CAR_HEIGHT))
+
+        # Level tiles are loaded on demand, and ahead of time in the background. The
+        # first level's came with the other sprites; a job that failed is left out,
+        # and the cache makes plain white tiles in its place when they're asked for.
+        self.textures = TextureCache()
+        for (_, path, scale), (_, rects, _) in first_level_jobs().items():
+            surfaces = sprites.get(("texture", path, scale))
+            if surfaces is not None:
+                self.textures.add({(path, rect, scale): surface for rect, surface in zip(rects, surfaces)})
+
+        # Desert background tiles, indexed by tile ID, for code that only knows the desert
+        desert_tiles = [frames[0] for frames in THEMES["desert"].tiles]
+        self.desert_tile_images_native = [self.textures.get(path, rect) for path, rect in desert_tiles]
+        self.desert_tile_images = [self.textures.get(path, rect, PIXEL_SCALE) for path, rect in desert_tiles]
+
+        # Collision masks, built once and shared by every game instance. Placeholder
+        # tiles are plain white, so their masks come out empty and nothing collides.
+        self.player_car_mask = pygame.mask.from_surface(self.scaled_player_car_image)
+        ground_color = self.desert_tile_images[SAFE_TILE_INDEX].get_at((0, 0)) if self.desert_tile_images else None
+        self.desert_tile_masks = [build_tile_mask(tile, ground_color) for tile in self.desert_tile_images]
+
+        # NPC traffic, indexed by car kind: each car type facing up, then facing down
+        self.npc_car_images_native = sprites["npc_cars"] or placeholder_sprites(2 * NUM_NPC_CAR_TYPES, car_size, BLACK)
+        npc_cars_scaled = sprites["npc_cars_scaled"] or [
+            pygame.transform.scale(car, (SCALED_CAR_WIDTH, SCALED_CAR_HEIGHT)) for car in self.npc_car_images_native]
+        self.npc_car_masks = [pygame.mask.from_surface(car) for car in npc_cars_scaled]
+
+        # HUD glyphs. Placeholders are plain black
+        glyph_size = (HUD_GLYPH_SIZE, HUD_GLYPH_SIZE)
+        self.hud_digits = sprites["hud_digits"] or placeholder_sprites(10, glyph_size, BLACK)
+        self.hud_damage_indicator = sprites["hud_damage_indicator"] or placeholder_sprites(2, glyph_size, BLACK)
+        self.hud_fuel_bar = (sprites["hud_fuel_bar"] or placeholder_sprites(1, (16, 56), BLACK))[0]
+        self.hud_panel = sprites["hud_panel"] or [placeholder_sprites(1, rect[2:], BLACK)[0] for rect in PANEL_RECTS]
+
+
+# --- Helper Functions ---
+# Function to display Game Over message
+def display_game_over_message(queue, assets):
+    """Submits the game over text, rendered once by GameAssets, to a native-resolution RenderQueue."""
+    center_x = NATIVE_WIDTH // 2
+    center_y = NATIVE_HEIGHT // 2
+
+    text_rect = assets.game_over_text.get_rect(center=(center_x, center_y - 30 // PIXEL_SCALE))
+    queue.submit(LAYER_HUD, assets.game_over_text, text_rect.topleft)
+
+    restart_rect = assets.restart_quit_text.get_rect(center=(center_x, center_y + 30 // PIXEL_SCALE))
+    queue.submit(LAYER_HUD, assets.restart_quit_text, restart_rect.topleft)
+
+# --- Drawing Functions ---
+# These submit to a RenderQueue at native resolution; game coordinates are divided by PIXEL_SCALE.
+def draw_player(queue, player_sprite, is_visible, native_image):
+    """Submits the player car if it's alive and visible."""
+    if player_sprite.alive() and is_visible:
+        player_screen_x = SCREEN_WIDTH // 2 - player_sprite.rect.width // 2
+        queue.submit(LAYER_PLAYER, native_image, (player_screen_x // PIXEL_SCALE, player_sprite.rect.y // PIXEL_SCALE))
+
+
+# --- Game Object Classes ---
+# Player Car Class
+class PlayerCar(pygame.sprite.Sprite):
+    def __init__(self, image, x, y):
+        super().__init__()
+        self.image = image
+        self.rect = self.image.get_rect()
+        self.rect.x = x
+        self.rect.y = y
+        self.speed = PLAYER_CAR_SPEED # Adjusted speed for better control without background scroll reference
+        self.player_visible = True
+
+    def update(self, keys, step):
+        """Steers for simulation step number `step`; see timestep.step_distance()."""
+        distance = step_distance(self.speed, step)
+        if keys[pygame.K_a]:
+            self.rect.x -= distance
+        if keys[pygame.K_d]:
+            self.rect.x += distance
+
+        # Keep car within screen boundaries (horizontal)
+        if self.rect.left < 0:
+            self.rect.left = 0
+        elif self.rect.right > SCREEN_WIDTH:
+            self.rect.right = SCREEN_WIDTH
+
+
+class KeyState:
+    """Stands in for pygame.key.get_pressed() when input is scripted.
+
+    Indexing with a key constant returns True if that key is held.
+    """
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+# --- Game State ---
+class GameCore:
+    """Holds one game's state and advances it one frame at a time.
+
+    The interactive window and the headless runner both drive this object;
+    it never reads the keyboard or the clock itself, so callers pass in the
+    key state and the elapsed milliseconds for every step.
+    """
+    def __init__(self, assets, seed=None, verbose=True, profiler=None):
+        self.assets = assets
+        self.rng = random.Random(seed)
+        self.verbose = verbose # Print collision messages
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+
+        self.camera_x = 0
+        self.background_scroll_y = 0
+        self.game_over = False
+        self.frame_count = 0
+
+        # Camera and scroll before the last update; drawing blends between these and the current ones
+        self.previous_camera_x = 0
+        self.previous_background_scroll_y = 0
+
+        # Invincibility state
+        self.player_invincible = False
+        self.invincibility_timer = 0
+        self.blink_timer = 0
+        self.player_visible = True # Controls if the player car is drawn
+
+        # Setup player car and sprite groups
+        self.player_car = None
+        self.all_sprites = pygame.sprite.Group()
+
+        # Create the background world, generated chunk by chunk from a seed
+        self.world = ChunkedWorld(self.rng.getrandbits(64))
+        self.levels = LevelMap(assets.textures)
+        self.background_renderer = BackgroundRenderer(assets.desert_tile_images_native, levels=self.levels)
+        self.rock_collider = RockCollider(assets.player_car_mask, assets.desert_tile_masks, levels=self.levels)
+
+        # NPC traffic, a fixed pool of cars in world coordinates
+        self.traffic = TrafficSystem(assets.npc_car_images_native, assets.npc_car_masks,
+                                     np.random.default_rng(self.rng.getrandbits(64)))
+
+        # Created on the first draw, so runs that never render don't pay for them
+        self.native_surface = None
+        self.render_queue = None
+        self.pixel_scaler = None
+        self.hud = None
+
+        self.reset() # Initialize game state, including invincibility and clearing start area
+
+    def reset(self):
+        """Resets the game state, granting invincibility and clearing the start area."""
+        self.player_car = PlayerCar(self.assets.scaled_player_car_image, (SCREEN_WIDTH - SCALED_CAR_WIDTH) // 2, SCREEN_HEIGHT - SCALED_CAR_HEIGHT - 10)
+        self.all_sprites = pygame.sprite.Group()
+        self.all_sprites.add(self.player_car)
+        self.camera_x = 0
+        self.game_over = False
+
+        # Always grant invincibility on reset
+        self.player_invincible = True
+        self.invincibility_timer = 0
+        self.blink_timer = 0
+        self.player_visible = True
+
+        # Clear rocks from player's starting area, and the road of traffic
+        self._clear_safe_zone()
+        self.traffic.clear()
+        self._save_previous_state() # Don't interpolate from where the last run ended
+
+    def _clear_safe_zone(self):
+        world = self.world
+        player_car = self.player_car
+
+        # Since player starts centered on screen and camera_x is 0 after a reset,
+        # the car's world position is its screen position moved down the road by
+        # the current scroll. The world doesn't repeat, so the area has to be
+        # cleared where the car is now, not where the run started.
+        center_tile_col_world = player_car.rect.centerx // SCALED_TILE_WIDTH
+        center_tile_row_world = (player_car.rect.centery + self.background_scroll_y) // SCALED_TILE_HEIGHT
+
+        safe_zone_radius = 1 # Clear a 3x3 area (1 tile around the center tile)
+        for dr in range(-safe_zone_radius, safe_zone_radius + 1):
+            for dc in range(-safe_zone_radius, safe_zone_radius + 1):
+                r_world = center_tile_row_world + dr
+                c_world = center_tile_col_world + dc
+                if SOLID_TILES[world.tile_at(r_world, c_world)]:
+                    world.set_tile(r_world, c_world, SAFE_TILE_INDEX)
+                    self.background_renderer.invalidate_cell(r_world, c_world)
+
+    def snapshot(self):
+        """Returns a copy of everything update() reads or changes.
+
+        Restoring it with restore() and feeding the same input gives the
+        same frames as the original run, which is what replay seeking and
+        checkpoints rely on.
+        """
+        return {
+            "frame_count": self.frame_count,
+            "camera_x": self.camera_x,
+            "background_scroll_y": self.background_scroll_y,
+            "game_over": self.game_over,
+            "player_invincible": self.player_invincible,
+            "invincibility_timer": self.invincibility_timer,
+            "blink_timer": self.blink_timer,
+            "player_visible": self.player_visible,
+            "player_topleft": self.player_car.rect.topleft,
+            "player_alive": self.player_car.alive(),
+            "rng_state": self.rng.getstate(),
+            "world": self.world.snapshot(),
+            "traffic": self.traffic.snapshot(),
+        }
+
+    def restore(self, snapshot):
+        """Puts back the state saved by snapshot()."""
+        self.frame_count = snapshot["frame_count"]
+        self.camera_x = snapshot["camera_x"]
+        self.background_scroll_y = snapshot["background_scroll_y"]
+        self.game_over = snapshot["game_over"]
+        self.player_invincible = snapshot["player_invincible"]
+        self.invincibility_timer = snapshot["invincibility_timer"]
+        self.blink_timer = snapshot["blink_timer"]
+        self.player_visible = snapshot["player_visible"]
+
+        self.player_car = PlayerCar(self.assets.scaled_player_car_image, *snapshot["player_topleft"])
+        self.all_sprites = pygame.sprite.Group()
+        if snapshot["player_alive"]:
+            self.all_sprites.add(self.player_car)
+
+        self.rng.setstate(snapshot["rng_state"])
+        self.world.restore(snapshot["world"])
+        self.background_renderer.invalidate_all() # Cached strips may show tiles from another point in the run
+        self.traffic.restore(snapshot["traffic"])
+        self._save_previous_state()
+
+    def _save_previous_state(self):
+        self.previous_camera_x = self.camera_x
+        self.previous_background_scroll_y = self.background_scroll_y
+        self.traffic.save_previous()
+
+    def update(self, keys, current_dt):
+        """Updates all game objects and game logic."""
+        self._save_previous_state()
+        if self.game_over:
+            return # Don't update game state if game is over
+
+        self.frame_count += 1
+
+        # Update player car
+        self.player_car.update(keys, self.frame_count)
+
+        # Update camera based on player's position
+        self.camera_x = self.player_car.rect.centerx - SCREEN_WIDTH // 2
+
+        # Update background vertical scroll
+        self.background_scroll_y -= step_distance(BACKGROUND_SCROLL_SPEED_Y, self.frame_count)
+        self.world.prefetch(self.background_scroll_y, SCREEN_HEIGHT)
+        self.levels.update(self.background_scroll_y)
+
+        # Handle invincibility and blinking
+        if self.player_invincible:
+            self.invincibility_timer += current_dt
+            if self.invincibility_timer >= INVINCIBILITY_DURATION:
+                self.player_invincible = False
+                self.player_visible = True # Ensure player is visible when invincibility ends
+            else:
+                self.blink_timer += current_dt
+                if self.blink_timer >= BLINK_INTERVAL:
+                    self.player_visible = not self.player_visible
+                    self.blink_timer = 0
+        else:
+            # If not invincible and car is alive, it should be visible
+            if self.player_car.alive(): # This check might be redundant if game_over handles it
+                self.player_visible = True
+
+        # Update NPC traffic
+        with self.profiler.phase("obstacles"):
+            self.traffic.update(current_dt, self.background_scroll_y)
+
+        # Collision logic with background rock tiles and traffic
+        if not self.player_invincible and self.player_car.alive():
+            with self.profiler.phase("collision"):
+                collided = self._check_collision()
+            if collided:
+                if self.verbose:
+                    print(f"Collision with {collided} detected!")
+                self.player_car.kill()
+                self.game_over = True
+
+    def _check_collision(self):
+        """Returns what the player car hit ("rock tile" or "NPC car"), or None."""
+        # Player's collision rectangle in screen coordinates (since car is drawn centered),
+        # moved into world coordinates by the camera and scroll offsets
+        player_world_left = SCREEN_WIDTH // 2 - self.player_car.rect.width // 2 + self.camera_x
+        player_world_top = self.player_car.rect.y + self.background_scroll_y
+        if self.rock_collider.collides(self.world, player_world_left, player_world_top):
+            return "rock tile"
+        if self.traffic.collides(self.assets.player_car_mask, player_world_left, player_world_top):
+            return "NPC car"
+        return None
+
+    def draw_native(self, alpha=1.0):
+        """Draws all game elements at native resolution and returns the surface.
+
+        alpha places the camera and the NPC cars between their positions
+        before (0) and after (1) the last update, so a renderer running
+        faster than the simulation can show the motion in between.
+        """
+        if self.native_surface is None:
+            self.native_surface = pygame.Surface((NATIVE_WIDTH, NATIVE_HEIGHT))
+            if pygame.display.get_surface() is not None:
+                self.native_surface = self.native_surface.convert()
+            self.render_queue = RenderQueue((NATIVE_WIDTH, NATIVE_HEIGHT))
+            self.hud = Hud(self.assets)
+        surface = self.native_surface
+        queue = self.render_queue
+
+        camera_x = math.floor(self.previous_camera_x + (self.camera_x - self.previous_camera_x) * alpha)
+        scroll_y = math.floor(self.previous_background_scroll_y
+                              + (self.background_scroll_y - self.previous_background_scroll_y) * alpha)
+
+        with self.profiler.phase("background"):
+            background = self.background_renderer.blit_sequence(
+                surface.get_size(), self.world, camera_x // PIXEL_SCALE, scroll_y // PIXEL_SCALE,
+                elapsed_ms(self.frame_count) // LEVEL_ANIMATION_INTERVAL)
+            if background is None:
+                surface.fill(WHITE) # Fallback to white if there is nothing to draw
+            else:
+                queue.submit_many(LAYER_BACKGROUND, background) # Covers the whole frame, so no clear is needed
+        with self.profiler.phase("sprites"):
+            self.traffic.submit(queue, LAYER_TRAFFIC, camera_x, scroll_y, alpha)
+            draw_player(queue, self.player_car, self.player_visible, self.assets.player_car_image_native)
+        with self.profiler.phase("hud"):
+            self._update_hud()
+            self.hud.submit(queue, LAYER_HUD)
+            if self.game_over:
+                display_game_over_message(queue, self.assets)
+        with self.profiler.phase("blits"):
+            queue.flush(surface)
+        return surface
+
+    def _update_hud(self):
+        # Speed over the ground in native pixels per second, steering included
+        step_x = self.camera_x - self.previous_camera_x
+        step_y = self.background_scroll_y - self.previous_background_scroll_y
+        speed = math.hypot(step_x, step_y) * SIMULATION_TICK_RATE / PIXEL_SCALE
+        top_row = self.background_scroll_y // SCALED_TILE_HEIGHT
+        progress = self.levels.rows_into_level(top_row) / self.levels.level_rows
+        self.hud.update(round(speed), -top_row, progress, self.game_over or self.player_invincible)
+
+    def draw(self, surface, alpha=1.0):
+        """Draws the frame at native resolution and upscales it once onto the given surface."""
+        if self.pixel_scaler is None:
+            self.pixel_scaler = PixelScaler((NATIVE_WIDTH, NATIVE_HEIGHT))
+        native_surface = self.draw_native(alpha)
+        with self.profiler.phase("present"):
+            self.pixel_scaler.present(native_surface, surface)
@@ -0,0 +1,94 @@
+"""Headless fixed-timestep runner and benchmark.
+
+Runs GameCore without a window, as fast as the CPU allows, for soak tests
+and AI training. Usage:
+
+    python -m headless --steps 20000 --render --seed 1
+    python -m headless --steps 20000 --autopilot
+"""
+import argparse
+import os
+import random
+import time
+
+import pygame
+
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, FIXED_DT
+from game_core import GameAssets, GameCore, KeyState
+from autopilot import Autopilot
+from profiler import FrameProfiler
+
+
+def init_headless():
+    """Initializes pygame on the dummy video driver and returns an offscreen surface.
+
+    The display surface still has to exist so that sprite loading can use
+    convert_alpha(), but nothing is ever shown. SDL's own signal handlers
+    are turned off: they turn SIGINT and SIGTERM into a quit event, and
+    headless processes (servers, rollout workers) never poll for events,
+    so kill and Ctrl+C would be ignored.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1")
+    pygame.init()
+    return pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+
+def random_key_script(seed=None, hold_frames=15):
+    """Yields KeyState objects that hold A, D or nothing for a few frames at a time."""
+    rng = random.Random(seed)
+    choices = [KeyState(), KeyState((pygame.K_a,)), KeyState((pygame.K_d,))]
+    while True:
+        keys = rng.choice(choices)
+        for _ in range(hold_frames):
+            yield keys
+
+
+def run_headless(game, key_script, steps, surface=None, dt=FIXED_DT, auto_reset=True):
+    """Advances the game a fixed number of steps with scripted input.
+
+    If a surface is given, every step is also drawn to it. Returns the
+    number of crashes (game overs) that happened during the run.
+    """
+    crashes = 0
+    for _ in range(steps):
+        game.update(next(key_script), dt)
+        if surface is not None:
+            game.draw(surface)
+        if game.game_over:
+            crashes += 1
+            if auto_reset:
+                game.reset() # Same as pressing R on the game over screen
+        game.profiler.end_frame()
+    return crashes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game simulation without a window.")
+    parser.add_argument("--steps", type=int, default=10000, help="number of fixed timesteps to simulate")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the layout and the scripted input")
+    parser.add_argument("--render", action="store_true", help="also draw every step to an offscreen surface")
+    parser.add_argument("--profile", action="store_true", help="print per-phase timings at the end")
+    parser.add_argument("--autopilot", action="store_true", help="steer with the built-in driver instead of random keys")
+    args = parser.parse_args(argv)
+
+    surface = init_headless()
+    profiler = FrameProfiler(enabled=args.profile)
+    game = GameCore(GameAssets(), seed=args.seed, verbose=False, profiler=profiler)
+    key_script = Autopilot(game) if args.autopilot else random_key_script(args.seed)
+
+    start = time.perf_counter()
+    crashes = run_headless(game, key_script, args.steps, surface if args.render else None)
+    elapsed = time.perf_counter() - start
+
+    mode = "update+draw" if args.render else "update only"
+    print(f"{args.steps} steps ({mode}) in {elapsed:.3f}s: "
+          f"{args.steps / elapsed:.0f} steps/s, {crashes} crashes")
+    if args.profile:
+        print("\n".join(profiler.format_summary()))
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
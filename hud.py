@@ -0,0 +1,146 @@
+"""Heads-up display: speed, distance, level progress and damage, built from the UI sheets.
+
+Everything is drawn into one small layer surface that is kept between
+frames. The layer is colorkeyed on the panel's background color, so only
+the labels, digits and gauge cover the road and the rest of it shows
+through. Each widget remembers what it last drew and only blits its
+glyphs again when its value changes, so a frame normally costs a single
+blit of the layer, with no font rendering and no new surfaces.
+"""
+import pygame
+
+from settings import NATIVE_WIDTH, HUD_GLYPH_SIZE, HUD_WIDTH, HUD_SPEED_DIGITS, HUD_DISTANCE_DIGITS
+
+# Parts of the Main_UI panel sheet, in the order of the "hud_panel" sprite job
+PANEL_SPEED_LABEL = (0, 80, 32, 8) # "SPD/"
+PANEL_DAMAGE_LABEL = (0, 56, 32, 8) # "DMG/"
+PANEL_FUEL_GAUGE = (20, 112, 8, 56) # Empty gauge frame, used for level progress; its "FUEL" label is left out
+PANEL_RECTS = [PANEL_SPEED_LABEL, PANEL_DAMAGE_LABEL, PANEL_FUEL_GAUGE]
+# The lit part of the Fuel_bar sprite, and where it sits in the gauge frame
+FUEL_BAR_AREA = (6, 4, 4, 48)
+FUEL_BAR_OFFSET = (2, 4)
+
+# Layout of the layer, top to bottom
+SPEED_LABEL_Y = 0
+SPEED_Y = SPEED_LABEL_Y + HUD_GLYPH_SIZE
+DISTANCE_Y = SPEED_Y + HUD_GLYPH_SIZE
+DAMAGE_LABEL_Y = DISTANCE_Y + HUD_GLYPH_SIZE
+DAMAGE_Y = DAMAGE_LABEL_Y + HUD_GLYPH_SIZE
+PROGRESS_GAUGE_Y = DAMAGE_Y + HUD_GLYPH_SIZE
+HUD_HEIGHT = PROGRESS_GAUGE_Y + PANEL_FUEL_GAUGE[3]
+
+
+def centered_x(width):
+    return (HUD_WIDTH - width) // 2
+
+
+class DigitCounter:
+    """A fixed number of digit glyphs showing a whole number, leading zeros included.
+
+    Values beyond the digits keep their last digits, like an odometer.
+    """
+    def __init__(self, layer, digit_glyphs, position, num_digits):
+        self.layer = layer
+        self.digit_glyphs = digit_glyphs
+        x, y = position
+        # Ones first, so set() can peel digits off the value from the right
+        self.positions = [(x + (num_digits - 1 - i) * HUD_GLYPH_SIZE, y) for i in range(num_digits)]
+        self.shown = [None] * num_digits
+        self.redraws = 0
+
+    def set(self, value):
+        value = max(0, int(value))
+        for i, position in enumerate(self.positions):
+            value, digit = divmod(value, 10)
+            if self.shown[i] != digit:
+                self.layer.blit(self.digit_glyphs[digit], position)
+                self.shown[i] = digit
+                self.redraws += 1
+
+
+class Indicator:
+    """One glyph out of several, e.g. the damage light off or on."""
+    def __init__(self, layer, glyphs, position):
+        self.layer = layer
+        self.glyphs = glyphs
+        self.position = position
+        self.shown = None
+        self.redraws = 0
+
+    def set(self, index):
+        if self.shown != index:
+            self.layer.blit(self.glyphs[index], self.position)
+            self.shown = index
+            self.redraws += 1
+
+
+class Gauge:
+    """An empty gauge frame with the bottom part of a bar sprite lit, in whole pixels."""
+    def __init__(self, layer, frame, bar, position):
+        self.layer = layer
+        self.frame = frame
+        self.bar = bar
+        self.position = position
+        self.bar_area = pygame.Rect(FUEL_BAR_AREA)
+        self.shown = None
+        self.redraws = 0
+
+    def set(self, fraction):
+        bar_x, bar_y, bar_width, bar_height = FUEL_BAR_AREA
+        height = round(min(max(fraction, 0.0), 1.0) * bar_height)
+        if self.shown == height:
+            return
+        x, y = self.position
+        self.layer.blit(self.frame, self.position)
+        if height:
+            self.bar_area.update(bar_x, bar_y + bar_height - height, bar_width, height)
+            self.layer.blit(self.bar, (x + FUEL_BAR_OFFSET[0], y + FUEL_BAR_OFFSET[1] + bar_height - height), self.bar_area)
+        self.shown = height
+        self.redraws += 1
+
+
+class Hud:
+    """The HUD layer and its widgets; see the module docstring.
+
+    Call update() with the current values, then submit() the layer to a
+    native-resolution RenderQueue.
+    """
+    def __init__(self, assets, position=(NATIVE_WIDTH - HUD_WIDTH, 0)):
+        self.position = position
+        speed_label, damage_label, gauge = assets.hud_panel
+
+        self.layer = pygame.Surface((HUD_WIDTH, HUD_HEIGHT))
+        if pygame.display.get_surface() is not None:
+            self.layer = self.layer.convert()
+        # Glyphs are drawn on the panel's background color, so blitting one still
+        # wipes what was there before, and the key makes all of it see-through
+        background = speed_label.get_at((0, 0))
+        self.layer.fill(background)
+        self.layer.set_colorkey(background)
+        self.layer.blit(speed_label, (0, SPEED_LABEL_Y))
+        self.layer.blit(damage_label, (0, DAMAGE_LABEL_Y))
+
+        digits = assets.hud_digits
+        self.speed = DigitCounter(self.layer, digits, (HUD_WIDTH - HUD_SPEED_DIGITS * HUD_GLYPH_SIZE, SPEED_Y),
+                                  HUD_SPEED_DIGITS)
+        self.distance = DigitCounter(self.layer, digits, (HUD_WIDTH - HUD_DISTANCE_DIGITS * HUD_GLYPH_SIZE, DISTANCE_Y),
+                                     HUD_DISTANCE_DIGITS)
+        self.damage = Indicator(self.layer, assets.hud_damage_indicator, (centered_x(HUD_GLYPH_SIZE), DAMAGE_Y))
+        self.progress = Gauge(self.layer, gauge, assets.hud_fuel_bar,
+                              (centered_x(gauge.get_width()), PROGRESS_GAUGE_Y))
+        self.widgets = [self.speed, self.distance, self.damage, self.progress]
+
+    @property
+    def redraws(self):
+        """Glyph blits into the layer so far, the first full draw included."""
+        return sum(widget.redraws for widget in self.widgets)
+
+    def update(self, speed, distance, progress, damaged):
+        """Redraws the widgets whose values changed. progress runs from 0 to 1."""
+        self.speed.set(speed)
+        self.distance.set(distance)
+        self.progress.set(progress)
+        self.damage.set(1 if damaged else 0)
+
+    def submit(self, queue, layer):
+        queue.submit(layer, self.layer, self.position)
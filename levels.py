@@ -0,0 +1,175 @@
+"""Level themes: which tile art and collision masks each stretch of road uses.
+
+The world stores theme-independent tile IDs (plain, speckled, cactus,
+rock); a Theme maps every ID to one or more animation frames of its own
+sheets. Levels are laid out along the road by world row, LEVEL_ROWS rows
+each, cycling through LEVEL_ORDER. Because the theme only depends on the
+row, the same seed always crashes on the same frame, whatever order the
+textures happened to finish loading in.
+"""
+from collision import build_tile_mask, mask_span
+from tilemap import SOLID_TILES
+from settings import (
+    PIXEL_SCALE, TILE_SPRITE_WIDTH, TILE_SPRITE_HEIGHT, SCALED_TILE_HEIGHT, SAFE_TILE_INDEX,
+    DESERT_SPRITESHEET_PATH, SUMMER_SPRITESHEET_PATH, WINTER_SPRITESHEET_PATH,
+    HIGHWAY_WATER_PATH, HIGHWAY_WATER_ANIMATION_PATH,
+    LEVEL_ORDER, LEVEL_ROWS, LEVEL_PRELOAD_ROWS,
+)
+
+
+def tile_rect(index):
+    """Rect of the index-th tile of a one-row spritesheet."""
+    return (index * TILE_SPRITE_WIDTH, 0, TILE_SPRITE_WIDTH, TILE_SPRITE_HEIGHT)
+
+
+class Theme:
+    """The art of one level.
+
+    tiles is indexed by tile ID; each entry is a list of (sheet path, rect)
+    frames, a single one for still tiles. The plain tile's first frame sets
+    the ground color that collision masks leave out, so a tile ID drawn
+    with plain ground has an empty mask and never collides.
+    """
+    def __init__(self, name, tiles):
+        self.name = name
+        self.tiles = tiles
+        self.frame_count = max(len(frames) for frames in tiles)
+
+    def frame(self, tile_id, animation_frame):
+        frames = self.tiles[tile_id]
+        return frames[animation_frame % len(frames)]
+
+    def texture_keys(self, scale):
+        """Cache keys of every frame of every tile at the given scale."""
+        return [(path, rect, scale) for frames in self.tiles for path, rect in frames]
+
+    def texture_jobs(self, scale):
+        """Asset pipeline jobs for every frame at the given scale, one per sheet.
+
+        Jobs are named ("texture", path, scale); each cuts its rects in the
+        order of texture_keys(), so their results can go straight into a
+        TextureCache.
+        """
+        rects_by_path = {}
+        for path, rect, _ in self.texture_keys(scale):
+            rects = rects_by_path.setdefault(path, [])
+            if rect not in rects:
+                rects.append(rect)
+        return {("texture", path, scale): (path, rects, scale) for path, rects in rects_by_path.items()}
+
+
+def sheet_tiles(path, indices):
+    """One still tile per tile ID, taken from a one-row spritesheet."""
+    return [[(path, tile_rect(i))] for i in indices]
+
+
+# Tile IDs are plain, speckled, cactus, rock. Winter has no third detail, so its
+# cacti are more speckles; the highway runs over water and has no rocks at all.
+WATER = (HIGHWAY_WATER_PATH, tile_rect(0))
+WAVES = [(HIGHWAY_WATER_ANIMATION_PATH, tile_rect(0)), (HIGHWAY_WATER_ANIMATION_PATH, tile_rect(1))]
+THEMES = {
+    "desert": Theme("desert", sheet_tiles(DESERT_SPRITESHEET_PATH, (0, 1, 2, 3))),
+    "summer": Theme("summer", sheet_tiles(SUMMER_SPRITESHEET_PATH, (0, 1, 2, 3))),
+    "winter": Theme("winter", sheet_tiles(WINTER_SPRITESHEET_PATH, (0, 1, 1, 2))),
+    "highway": Theme("highway", [[WATER], WAVES, WAVES[::-1], [WATER]]),
+}
+
+
+def first_level_jobs():
+    """Asset pipeline jobs for the first level's textures, so they load behind the loading screen."""
+    theme = THEMES[LEVEL_ORDER[0]]
+    return {**theme.texture_jobs(1), **theme.texture_jobs(PIXEL_SCALE)}
+
+
+class LevelMap:
+    """Looks up the theme, tile images and collision masks of any world row.
+
+    Textures come from a shared TextureCache. Call update() once per step:
+    when the next level comes within preload_rows of the top of the screen,
+    its textures start loading in the background, and its collision masks
+    are built the step they arrive, so both are ready before the first of
+    its rows is drawn or collided with.
+    """
+    def __init__(self, texture_cache, themes=None, level_rows=LEVEL_ROWS, preload_rows=LEVEL_PRELOAD_ROWS):
+        self.texture_cache = texture_cache
+        self.themes = themes if themes is not None else [THEMES[name] for name in LEVEL_ORDER]
+        self.level_rows = level_rows
+        self.preload_rows = preload_rows
+        self.solid_masks = {} # Theme name -> mask per tile ID, None for tiles the car drives over
+        self.solid_spans = {} # Theme name -> mask_span() of each of those masks, None where a mask is empty
+        self.preloaded_level = None
+        self.preload(0)
+        self._build_loaded_masks()
+
+    def level_at_row(self, row):
+        """Level number of a world row. The road scrolls towards negative rows,
+        so level 0 is the start and everything below it."""
+        return max(0, -1 - row) // self.level_rows
+
+    def rows_into_level(self, row):
+        """How many rows of its level are below a world row."""
+        return max(0, -1 - row) % self.level_rows
+
+    def theme_at_row(self, row):
+        return self.themes[self.level_at_row(row) % len(self.themes)]
+
+    def frame_count(self, row):
+        return self.theme_at_row(row).frame_count
+
+    def tile_images(self, row, animation_frame=0):
+        """Native tile images of a row's theme, indexed by tile ID."""
+        theme = self.theme_at_row(row)
+        get = self.texture_cache.get
+        return [get(*theme.frame(tile_id, animation_frame)) for tile_id in range(len(theme.tiles))]
+
+    def tile_masks(self, row):
+        """Collision masks of a row's theme, indexed by tile ID (None where SOLID_TILES is False)."""
+        theme = self.theme_at_row(row)
+        if theme.name not in self.solid_masks:
+            self._build_masks(theme)
+        return self.solid_masks[theme.name]
+
+    def tile_spans(self, row):
+        """The (left, right) x range of each of tile_masks(row), None for no mask or an empty one."""
+        theme = self.theme_at_row(row)
+        if theme.name not in self.solid_spans:
+            self._build_masks(theme)
+        return self.solid_spans[theme.name]
+
+    def _mask_keys(self, theme):
+        return [(path, rect, PIXEL_SCALE) for path, rect in (frames[0] for frames in theme.tiles)]
+
+    def _build_masks(self, theme):
+        get = self.texture_cache.get
+        scaled = [get(*key) for key in self._mask_keys(theme)]
+        ground_color = scaled[SAFE_TILE_INDEX].get_at((0, 0))
+        masks = [build_tile_mask(tile, ground_color) if SOLID_TILES[tile_id] else None
+                 for tile_id, tile in enumerate(scaled)]
+        self.solid_masks[theme.name] = masks
+        self.solid_spans[theme.name] = [mask_span(mask) if mask is not None else None for mask in masks]
+
+    def _build_loaded_masks(self):
+        """Builds the preloaded level's masks as soon as its textures are in, before any row needs them."""
+        theme = self.themes[self.preloaded_level % len(self.themes)]
+        if theme.name in self.solid_masks:
+            return
+        if all(self.texture_cache.contains(*key) for key in self._mask_keys(theme)):
+            self._build_masks(theme)
+
+    def preload(self, level):
+        """Starts loading a level's textures in the background."""
+        theme = self.themes[level % len(self.themes)]
+        keys = theme.texture_keys(1)
+        if theme.name not in self.solid_masks:
+            keys += theme.texture_keys(PIXEL_SCALE)
+        self.texture_cache.prefetch(keys)
+        self.preloaded_level = level
+
+    def update(self, scroll_y):
+        """Collects finished loads and starts the next level's when it is close."""
+        self.texture_cache.poll()
+        top_row = scroll_y // SCALED_TILE_HEIGHT
+        level = self.level_at_row(top_row - self.preload_rows)
+        if level != self.preloaded_level:
+            self.preload(level)
+        self._build_loaded_masks()
@@ -0,0 +1,231 @@
+"""Shared-road multiplayer simulation and its snapshot format.
+
+MultiplayerGame is the server side: one world, one scroll and one traffic
+pool, with up to NET_MAX_PLAYERS cars driving on it. It reuses the single
+player pieces (ChunkedWorld, TrafficSystem, RockCollider) and the same
+per-step rules as GameCore.update().
+
+Snapshots are fixed-layout byte strings, so the delta against any earlier
+snapshot is a byte-wise XOR, which is almost all zeros and compresses to a
+few dozen bytes. MultiplayerView draws a decoded snapshot on a client.
+"""
+import random
+import zlib
+
+import numpy as np
+import pygame
+
+from background import BackgroundRenderer
+from collision import RockCollider
+from game_core import display_game_over_message
+from levels import LevelMap
+from render import PixelScaler, RenderQueue, LAYER_BACKGROUND, LAYER_TRAFFIC, LAYER_PLAYER
+from replay import KEY_A, KEY_D, KEY_R
+from timestep import step_distance, elapsed_ms
+from traffic import TrafficSystem
+from world import ChunkedWorld
+from settings import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, PIXEL_SCALE, NATIVE_WIDTH, NATIVE_HEIGHT,
+    SCALED_CAR_WIDTH, SCALED_CAR_HEIGHT, PLAYER_CAR_SPEED,
+    BACKGROUND_SCROLL_SPEED_Y, INVINCIBILITY_DURATION, BLINK_INTERVAL,
+    TRAFFIC_POOL_SIZE, NET_MAX_PLAYERS, NET_PLAYER_SPACING, LEVEL_ANIMATION_INTERVAL,
+)
+
+# Input bits, the same as in recordings
+INPUT_LEFT = KEY_A
+INPUT_RIGHT = KEY_D
+INPUT_RESPAWN = KEY_R
+
+# Player flags
+PLAYER_CONNECTED = 1
+PLAYER_GAME_OVER = 2
+PLAYER_INVINCIBLE = 4
+
+PLAYER_SCREEN_Y = SCREEN_HEIGHT - SCALED_CAR_HEIGHT - 10 # Same place GameCore.reset() puts the car
+NO_CAR = 255 # Car kind of an empty traffic slot
+
+HEADER_DTYPE = np.dtype([("tick", "<u4"), ("scroll_y", "<i4")])
+PLAYER_DTYPE = np.dtype([("x", "<i2"), ("flags", "u1"), ("crashes", "<u2"), ("invincibility_timer", "<f4")])
+CAR_DTYPE = np.dtype([("x", "<i2"), ("y", "<i4"), ("kind", "u1")]) # y in native pixels, which is all a client draws
+
+
+def steer(x, mask, seq):
+    """Returns a car's x after input number seq, exactly as PlayerCar.update() moves it on step seq.
+
+    The distance depends on the step (see timestep.step_distance()), so the
+    server and a predicting client both go by the input's sequence number.
+    """
+    distance = step_distance(PLAYER_CAR_SPEED, seq)
+    if mask & INPUT_LEFT:
+        x -= distance
+    if mask & INPUT_RIGHT:
+        x += distance
+    return min(max(x, 0), SCREEN_WIDTH - SCALED_CAR_WIDTH)
+
+def start_x(slot):
+    """Starting x of a player slot: four lanes around the middle of the road."""
+    return (SCREEN_WIDTH - SCALED_CAR_WIDTH) // 2 + (2 * (slot % 4) - 3) * NET_PLAYER_SPACING // 2
+
+
+class Snapshot:
+    """Decoded state of one server tick: a header, the player slots and the traffic slots."""
+    def __init__(self, data, max_players=NET_MAX_PLAYERS, traffic_slots=TRAFFIC_POOL_SIZE):
+        self.data = data
+        header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+        self.tick = int(header["tick"])
+        self.scroll_y = int(header["scroll_y"])
+        self.players = np.frombuffer(data, dtype=PLAYER_DTYPE, count=max_players, offset=HEADER_DTYPE.itemsize)
+        self.cars = np.frombuffer(data, dtype=CAR_DTYPE, count=traffic_slots,
+                                  offset=HEADER_DTYPE.itemsize + self.players.nbytes)
+
+
+def encode_delta(data, base=None):
+    """Compresses a snapshot, as an XOR against base if one is given."""
+    if base is not None:
+        data = np.bitwise_xor(np.frombuffer(data, dtype=np.uint8), np.frombuffer(base, dtype=np.uint8)).tobytes()
+    return zlib.compress(data, 1)
+
+def decode_delta(payload, base=None):
+    """Undoes encode_delta()."""
+    data = zlib.decompress(payload)
+    if base is not None:
+        data = np.bitwise_xor(np.frombuffer(data, dtype=np.uint8), np.frombuffer(base, dtype=np.uint8)).tobytes()
+    return data
+
+
+class MultiplayerGame:
+    """Authoritative state of a shared road.
+
+    Players share the world, the scroll and the traffic; each has its own
+    x, game over flag and invincibility. Respawning doesn't clear rocks
+    like GameCore.reset() does, because clients build the world from the
+    seed and never see tile edits; the invincibility after a respawn is
+    what keeps a player from crashing straight away.
+    """
+    def __init__(self, assets, seed=None, max_players=NET_MAX_PLAYERS):
+        self.assets = assets
+        self.max_players = max_players
+        rng = random.Random(seed)
+        self.world_seed = rng.getrandbits(64)
+        self.world = ChunkedWorld(self.world_seed)
+        self.levels = LevelMap(assets.textures)
+        self.rock_collider = RockCollider(assets.player_car_mask, assets.desert_tile_masks, levels=self.levels)
+        self.traffic = TrafficSystem(assets.npc_car_images_native, assets.npc_car_masks,
+                                     np.random.default_rng(rng.getrandbits(64)))
+        self.tick = 0
+        self.background_scroll_y = 0
+
+        self.players = np.zeros(max_players, dtype=PLAYER_DTYPE)
+        self._cars = np.zeros(self.traffic.capacity, dtype=CAR_DTYPE) # Reused by every snapshot()
+
+    def add_player(self):
+        """Takes a free slot and returns its index, or None if the game is full."""
+        free = np.flatnonzero((self.players["flags"] & PLAYER_CONNECTED) == 0)
+        if free.size == 0:
+            return None
+        slot = int(free[0])
+        self.players[slot] = (0, PLAYER_CONNECTED, 0, 0)
+        self.respawn(slot)
+        return slot
+
+    def remove_player(self, slot):
+        self.players[slot] = (0, 0, 0, 0)
+
+    def respawn(self, slot):
+        player = self.players[slot]
+        player["x"] = start_x(slot)
+        player["flags"] = PLAYER_CONNECTED | PLAYER_INVINCIBLE
+        player["invincibility_timer"] = 0
+
+    def update(self, inputs, current_dt):
+        """Advances the road one step. inputs maps player slot to (input sequence number, input mask)."""
+        self.tick += 1
+        self.background_scroll_y -= step_distance(BACKGROUND_SCROLL_SPEED_Y, self.tick)
+        self.world.prefetch(self.background_scroll_y, SCREEN_HEIGHT)
+        self.levels.update(self.background_scroll_y)
+        self.traffic.update(current_dt, self.background_scroll_y)
+
+        top = PLAYER_SCREEN_Y + self.background_scroll_y
+        for slot in np.flatnonzero(self.players["flags"] & PLAYER_CONNECTED).tolist():
+            player = self.players[slot] # A view; writing its fields updates the array
+            seq, mask = inputs.get(slot, (0, 0))
+            flags = int(player["flags"])
+            if flags & PLAYER_GAME_OVER:
+                if mask & INPUT_RESPAWN:
+                    self.respawn(slot)
+                continue
+
+            x = steer(int(player["x"]), mask, seq)
+            player["x"] = x
+            if flags & PLAYER_INVINCIBLE:
+                timer = float(player["invincibility_timer"]) + current_dt
+                if timer >= INVINCIBILITY_DURATION:
+                    player["flags"] = flags & ~PLAYER_INVINCIBLE
+                    timer = 0
+                player["invincibility_timer"] = timer
+            elif (self.rock_collider.collides(self.world, x, top)
+                  or self.traffic.collides(self.assets.player_car_mask, x, top)):
+                player["flags"] = flags | PLAYER_GAME_OVER
+                player["crashes"] += 1
+
+    def snapshot(self):
+        """Returns the current state as snapshot bytes (see Snapshot)."""
+        traffic = self.traffic
+        cars = self._cars
+        cars["x"] = traffic.x
+        cars["y"] = np.floor(traffic.y).astype(np.int64) // PIXEL_SCALE
+        cars["kind"] = np.where(traffic.active, traffic.kind, NO_CAR)
+        cars["y"][~traffic.active] = 0 # Keep empty slots constant so they delta to zero
+        cars["x"][~traffic.active] = 0
+        header = np.array([(self.tick, self.background_scroll_y)], dtype=HEADER_DTYPE)
+        return header.tobytes() + self.players.tobytes() + cars.tobytes()
+
+
+class MultiplayerView:
+    """Draws snapshots for one client, centred on its own (predicted) car."""
+    def __init__(self, assets, world_seed):
+        self.assets = assets
+        self.world = ChunkedWorld(world_seed)
+        self.levels = LevelMap(assets.textures)
+        self.background_renderer = BackgroundRenderer(assets.desert_tile_images_native, levels=self.levels)
+        self.traffic = TrafficSystem(assets.npc_car_images_native, assets.npc_car_masks, rng=None)
+        self.native_surface = pygame.Surface((NATIVE_WIDTH, NATIVE_HEIGHT))
+        if pygame.display.get_surface() is not None:
+            self.native_surface = self.native_surface.convert()
+        self.render_queue = RenderQueue((NATIVE_WIDTH, NATIVE_HEIGHT))
+        self.pixel_scaler = PixelScaler((NATIVE_WIDTH, NATIVE_HEIGHT))
+
+    def draw(self, window, snapshot, own_slot, own_x):
+        surface = self.native_surface
+        queue = self.render_queue
+        camera_x = own_x + SCALED_CAR_WIDTH // 2 - SCREEN_WIDTH // 2
+        self.world.prefetch(snapshot.scroll_y, SCREEN_HEIGHT)
+        self.levels.update(snapshot.scroll_y)
+        queue.submit_many(LAYER_BACKGROUND, self.background_renderer.blit_sequence(
+            surface.get_size(), self.world, camera_x // PIXEL_SCALE, snapshot.scroll_y // PIXEL_SCALE,
+            elapsed_ms(snapshot.tick) // LEVEL_ANIMATION_INTERVAL))
+
+        traffic = self.traffic
+        cars = snapshot.cars
+        traffic.active[:] = cars["kind"] != NO_CAR
+        traffic.kind[:] = np.where(traffic.active, cars["kind"], 0)
+        traffic.x[:] = cars["x"]
+        traffic.y[:] = cars["y"].astype(np.int64) * PIXEL_SCALE
+        traffic.previous_y[:] = traffic.y
+        traffic.submit(queue, LAYER_TRAFFIC, camera_x, snapshot.scroll_y)
+
+        screen_y = PLAYER_SCREEN_Y // PIXEL_SCALE
+        images = self.assets.player_car_images_native
+        for slot in np.flatnonzero(snapshot.players["flags"] & PLAYER_CONNECTED).tolist():
+            player = snapshot.players[slot]
+            flags = int(player["flags"])
+            x = own_x if slot == own_slot else int(player["x"])
+            blinking = flags & PLAYER_INVINCIBLE and (int(player["invincibility_timer"]) // BLINK_INTERVAL) % 2 == 1
+            if flags & PLAYER_GAME_OVER or blinking:
+                continue
+            queue.submit(LAYER_PLAYER, images[slot % len(images)], ((x - camera_x) // PIXEL_SCALE, screen_y))
+
+        if snapshot.players[own_slot]["flags"] & PLAYER_GAME_OVER:
+            display_game_over_message(queue, self.assets)
+        queue.flush(surface)
+        self.pixel_scaler.present(surface, window)
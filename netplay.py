@@ -0,0 +1,428 @@
+"""Authoritative multiplayer server and client over asyncio UDP.
+
+The server runs MultiplayerGame at the fixed tick rate. Every tick it
+sends each client a snapshot, delta-compressed against the newest
+snapshot that client has acknowledged. Clients send their input for every
+step, repeating the last NET_INPUT_REDUNDANCY steps in each packet, and
+predict their own car from inputs the server hasn't processed yet.
+
+Both ends can add simulated latency and packet loss, and `bench` runs a
+loopback server with growing numbers of bot clients. Usage:
+
+    python -m netplay serve --port 7777 --seed 1
+    python main.py --connect 127.0.0.1:7777
+    python -m netplay bench --players 1 2 4 8 16 --latency-ms 50 --loss 0.05
+"""
+import argparse
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+from settings import (
+    FIXED_DT, NET_DEFAULT_PORT, NET_MAX_PLAYERS, NET_SNAPSHOT_HISTORY, NET_INPUT_REDUNDANCY,
+    NET_INPUT_BUFFER, NET_CLIENT_TIMEOUT,
+)
+from multiplayer import (
+    MultiplayerGame, MultiplayerView, Snapshot, encode_delta, decode_delta, steer,
+    INPUT_RESPAWN, PLAYER_GAME_OVER,
+)
+from replay import keys_to_mask
+from timestep import FixedTimestep
+
+PACKET_JOIN = b"J"
+PACKET_WELCOME = b"W"
+PACKET_INPUT = b"I"
+PACKET_SNAPSHOT = b"S"
+PACKET_LEAVE = b"L"
+
+WELCOME = struct.Struct("<cBQI") # Type, player slot, world seed, server tick
+INPUT_HEADER = struct.Struct("<cIIB") # Type, newest snapshot tick received, newest input sequence number, mask count
+SNAPSHOT_HEADER = struct.Struct("<cIII") # Type, tick, base tick, newest input sequence number processed
+NO_BASE = 0xFFFFFFFF # Base tick of a snapshot sent in full
+JOIN_RETRY_SECONDS = 0.2
+
+
+class LossyLink:
+    """Sends datagrams through a transport, optionally late or not at all.
+
+    With latency and loss at 0 this is a plain pass-through; otherwise it
+    simulates a bad network on loopback. Counts the bytes it is asked to send.
+    """
+    def __init__(self, transport, latency=0.0, loss=0.0, seed=None):
+        self.transport = transport
+        self.latency = latency # Seconds, one way
+        self.loss = loss # Fraction of datagrams dropped
+        self.rng = random.Random(seed)
+        self.bytes_sent = 0
+
+    def sendto(self, data, address=None):
+        self.bytes_sent += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            return
+        if self.latency > 0:
+            asyncio.get_running_loop().call_later(self.latency, self._send, data, address)
+        else:
+            self._send(data, address)
+
+    def _send(self, data, address):
+        if not self.transport.is_closing():
+            self.transport.sendto(data, address)
+
+
+class _RemotePlayer:
+    """What the server knows about one connected client."""
+    def __init__(self, slot, address, now):
+        self.slot = slot
+        self.address = address
+        self.inputs = {} # Input sequence number -> mask, not yet applied
+        self.processed_seq = 0
+        self.acked_tick = None
+        self.last_heard = now
+        self.bytes_sent = 0
+        self.full_snapshots = 0
+        self.delta_snapshots = 0
+
+
+class GameServer(asyncio.DatagramProtocol):
+    """Runs a MultiplayerGame and keeps its clients in sync."""
+    def __init__(self, assets, seed=None, latency=0.0, loss=0.0, step_ms=FIXED_DT):
+        self.game = MultiplayerGame(assets, seed)
+        self.latency = latency
+        self.loss = loss
+        self.step_ms = step_ms
+        self.link = None
+        self.players = {} # Address -> _RemotePlayer
+        self.departed = [] # Players who left, kept for their traffic statistics
+        self.history = {} # Tick -> snapshot bytes, the last NET_SNAPSHOT_HISTORY ticks
+        self.tick_times = deque(maxlen=10000) # Seconds spent in each step()
+        self._running = False
+
+    def connection_made(self, transport):
+        self.link = LossyLink(transport, self.latency, self.loss)
+
+    def datagram_received(self, data, address):
+        kind = data[:1]
+        player = self.players.get(address)
+        if player is not None:
+            player.last_heard = time.monotonic()
+        if kind == PACKET_JOIN:
+            self._on_join(address, player)
+        elif kind == PACKET_INPUT and player is not None:
+            self._on_input(player, data)
+        elif kind == PACKET_LEAVE and player is not None:
+            self._drop(player)
+
+    def _on_join(self, address, player):
+        if player is None: # A repeated join (the welcome got lost) gets the same slot
+            slot = self.game.add_player()
+            if slot is None:
+                return # Full; the client will give up after its retries
+            player = _RemotePlayer(slot, address, time.monotonic())
+            self.players[address] = player
+        self.link.sendto(WELCOME.pack(PACKET_WELCOME, player.slot, self.game.world_seed, self.game.tick), address)
+
+    def _on_input(self, player, data):
+        _, acked_tick, newest_seq, count = INPUT_HEADER.unpack_from(data)
+        if acked_tick != NO_BASE and (player.acked_tick is None or acked_tick > player.acked_tick):
+            player.acked_tick = acked_tick
+        masks = data[INPUT_HEADER.size:INPUT_HEADER.size + count]
+        first_seq = newest_seq - count + 1
+        for offset, mask in enumerate(masks):
+            seq = first_seq + offset
+            if seq > player.processed_seq:
+                player.inputs[seq] = mask
+        # A client far ahead of the server skips its oldest inputs instead of building up lag
+        while len(player.inputs) > NET_INPUT_BUFFER:
+            oldest = min(player.inputs)
+            del player.inputs[oldest]
+            player.processed_seq = max(player.processed_seq, oldest)
+
+    def _drop(self, player):
+        self.game.remove_player(player.slot)
+        del self.players[player.address]
+        self.departed.append(player)
+
+    def step(self):
+        """Applies one input per player, advances the game and sends everyone a snapshot."""
+        start = time.perf_counter()
+        inputs = {}
+        for player in self.players.values():
+            # A missing input counts as no keys held, which doesn't move the car, so the
+            # client's prediction (which only replays inputs the server has seen) stays right
+            mask = player.inputs.pop(player.processed_seq + 1, None)
+            if mask is not None:
+                player.processed_seq += 1
+                inputs[player.slot] = (player.processed_seq, mask)
+        game = self.game
+        game.update(inputs, self.step_ms)
+
+        snapshot = game.snapshot()
+        self.history[game.tick] = snapshot
+        self.history.pop(game.tick - NET_SNAPSHOT_HISTORY, None)
+        for player in self.players.values():
+            base = self.history.get(player.acked_tick)
+            if base is None:
+                header = SNAPSHOT_HEADER.pack(PACKET_SNAPSHOT, game.tick, NO_BASE, player.processed_seq)
+                player.full_snapshots += 1
+            else:
+                header = SNAPSHOT_HEADER.pack(PACKET_SNAPSHOT, game.tick, player.acked_tick, player.processed_seq)
+                player.delta_snapshots += 1
+            packet = header + encode_delta(snapshot, base)
+            player.bytes_sent += len(packet)
+            self.link.sendto(packet, player.address)
+
+        now = time.monotonic()
+        for player in [p for p in self.players.values() if now - p.last_heard > NET_CLIENT_TIMEOUT]:
+            self._drop(player)
+        self.tick_times.append(time.perf_counter() - start)
+
+    async def run(self):
+        """Steps the game at the fixed tick rate until stop() is called."""
+        loop = asyncio.get_running_loop()
+        step_seconds = self.step_ms / 1000
+        next_tick = loop.time()
+        self._running = True
+        while self._running:
+            self.step()
+            next_tick += step_seconds
+            delay = next_tick - loop.time()
+            if delay < -step_seconds: # Fell behind; don't try to catch up with a burst of ticks
+                next_tick = loop.time()
+            await asyncio.sleep(max(0.0, delay))
+
+    def stop(self):
+        self._running = False
+
+
+class GameClient(asyncio.DatagramProtocol):
+    """The network side of a player: joins, sends input, decodes snapshots and predicts its car."""
+    def __init__(self, latency=0.0, loss=0.0):
+        self.latency = latency
+        self.loss = loss
+        self.link = None
+        self.slot = None
+        self.world_seed = None
+        self._welcomed = asyncio.get_running_loop().create_future()
+
+        self.snapshots = {} # Tick -> snapshot bytes, kept as bases for later deltas
+        self.latest = None # Newest decoded Snapshot
+        self.input_seq = 0
+        self.pending_inputs = deque() # (seq, mask) sent but not yet processed by the server
+        self.predicted_x = 0
+        self.bytes_received = 0
+        self.corrections = 0 # Times the server disagreed with the prediction
+
+    def connection_made(self, transport):
+        self.link = LossyLink(transport, self.latency, self.loss)
+
+    def datagram_received(self, data, address):
+        self.bytes_received += len(data)
+        kind = data[:1]
+        if kind == PACKET_WELCOME and not self._welcomed.done():
+            _, self.slot, self.world_seed, _ = WELCOME.unpack(data)
+            self._welcomed.set_result(True)
+        elif kind == PACKET_SNAPSHOT and self.slot is not None:
+            self._on_snapshot(data)
+
+    def _on_snapshot(self, data):
+        _, tick, base_tick, processed_seq = SNAPSHOT_HEADER.unpack_from(data)
+        if self.latest is not None and tick <= self.latest.tick:
+            return # Late or duplicated
+        base = None
+        if base_tick != NO_BASE:
+            base = self.snapshots.get(base_tick)
+            if base is None:
+                return # Delta against a snapshot we no longer have; a later one will do
+        snapshot_bytes = decode_delta(data[SNAPSHOT_HEADER.size:], base)
+        self.snapshots[tick] = snapshot_bytes
+        for old_tick in [t for t in self.snapshots if t <= tick - NET_SNAPSHOT_HISTORY]:
+            del self.snapshots[old_tick]
+        self.latest = Snapshot(snapshot_bytes)
+        self._reconcile(processed_seq)
+
+    def _reconcile(self, processed_seq):
+        """Restarts the prediction from the server's car and replays the inputs it hasn't seen."""
+        while self.pending_inputs and self.pending_inputs[0][0] <= processed_seq:
+            self.pending_inputs.popleft()
+        player = self.latest.players[self.slot]
+        x = int(player["x"])
+        if not player["flags"] & PLAYER_GAME_OVER:
+            for seq, mask in self.pending_inputs:
+                x = steer(x, mask, seq)
+        if x != self.predicted_x:
+            self.corrections += 1
+        self.predicted_x = x
+
+    @property
+    def game_over(self):
+        return self.latest is not None and bool(self.latest.players[self.slot]["flags"] & PLAYER_GAME_OVER)
+
+    async def join(self, attempts=25):
+        """Asks the server for a slot, retrying in case packets are lost."""
+        for _ in range(attempts):
+            self.link.sendto(PACKET_JOIN)
+            try:
+                await asyncio.wait_for(asyncio.shield(self._welcomed), JOIN_RETRY_SECONDS)
+                return
+            except asyncio.TimeoutError:
+                continue
+        raise ConnectionError("no welcome from the server")
+
+    def send_input(self, mask):
+        """Sends one step of input and applies it to the predicted car."""
+        self.input_seq += 1
+        self.pending_inputs.append((self.input_seq, mask))
+        if not self.game_over:
+            self.predicted_x = steer(self.predicted_x, mask, self.input_seq)
+
+        recent = [m for _, m in list(self.pending_inputs)[-NET_INPUT_REDUNDANCY:]]
+        acked_tick = self.latest.tick if self.latest is not None else NO_BASE
+        self.link.sendto(INPUT_HEADER.pack(PACKET_INPUT, acked_tick, self.input_seq, len(recent)) + bytes(recent))
+
+    def leave(self):
+        self.link.sendto(PACKET_LEAVE)
+
+
+async def connect(host, port, latency=0.0, loss=0.0):
+    """Opens a client endpoint and joins the server. Returns (transport, client)."""
+    loop = asyncio.get_running_loop()
+    transport, client = await loop.create_datagram_endpoint(
+        lambda: GameClient(latency, loss), remote_addr=(host, port))
+    await client.join()
+    return transport, client
+
+
+async def play(screen, assets, host, port, fps=0):
+    """Client mode for main.py: drives a window from the server's snapshots."""
+    transport, client = await connect(host, port)
+    view = MultiplayerView(assets, client.world_seed)
+    timestep = FixedTimestep(FIXED_DT)
+    last_frame_time = time.perf_counter()
+    respawn_requested = False
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN and client.game_over:
+                if event.key == pygame.K_r:
+                    respawn_requested = True # Sent with the next step's input
+                if event.key == pygame.K_q:
+                    running = False
+        keys = pygame.key.get_pressed()
+
+        now = time.perf_counter()
+        for _ in range(timestep.advance((now - last_frame_time) * 1000)):
+            client.send_input(keys_to_mask(keys) | (INPUT_RESPAWN if respawn_requested else 0))
+            respawn_requested = False
+        last_frame_time = now
+
+        if client.latest is not None:
+            view.draw(screen, client.latest, client.slot, client.predicted_x)
+            pygame.display.flip()
+        # Hand control to the event loop so snapshots get received, and cap the frame rate if asked
+        await asyncio.sleep(1 / fps if fps else 0)
+
+    client.leave()
+    await asyncio.sleep(0) # Let the leave packet go out
+    transport.close()
+
+
+async def _run_bot(host, port, seconds, seed, latency, loss):
+    """A headless client steering at random and respawning after every crash."""
+    transport, client = await connect(host, port, latency, loss)
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    step_seconds = FIXED_DT / 1000
+    end = loop.time() + seconds
+    next_step = loop.time()
+    mask = 0
+    while loop.time() < end:
+        if rng.random() < 1 / 15: # Change direction every quarter second or so
+            mask = rng.choice((0, 1, 2))
+        client.send_input(mask | (INPUT_RESPAWN if client.game_over else 0))
+        next_step += step_seconds
+        await asyncio.sleep(max(0.0, next_step - loop.time()))
+    client.leave()
+    transport.close()
+    return client
+
+
+async def benchmark(assets, player_counts, seconds, latency, loss, seed=None):
+    """Runs a loopback server with each number of bot clients and prints bandwidth and tick cost."""
+    print(f"{'players':>8}{'kB/s/client':>13}{'delta %':>9}{'tick ms':>9}{'p99 ms':>8}{'corrections/s':>15}")
+    for count in player_counts:
+        loop = asyncio.get_running_loop()
+        server = GameServer(assets, seed, latency, loss)
+        transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=("127.0.0.1", 0))
+        port = transport.get_extra_info("sockname")[1]
+        server_task = asyncio.create_task(server.run())
+
+        clients = await asyncio.gather(*(_run_bot("127.0.0.1", port, seconds, i, latency, loss) for i in range(count)))
+        server.stop()
+        await server_task
+        transport.close()
+
+        players = server.departed + list(server.players.values())
+        tick_ms = np.array(server.tick_times) * 1000
+        total_bytes = sum(p.bytes_sent for p in players)
+        full = sum(p.full_snapshots for p in players)
+        delta = sum(p.delta_snapshots for p in players)
+        corrections = sum(c.corrections for c in clients)
+        print(f"{count:>8}{total_bytes / count / seconds / 1000:>13.2f}{100 * delta / max(1, full + delta):>9.1f}"
+              f"{tick_ms.mean():>9.3f}{np.percentile(tick_ms, 99):>8.3f}{corrections / count / seconds:>15.2f}")
+
+
+def parse_address(text):
+    """Parses HOST:PORT; the port defaults to NET_DEFAULT_PORT."""
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, NET_DEFAULT_PORT
+    return host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multiplayer server and loopback benchmark.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="run a server until interrupted")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=NET_DEFAULT_PORT)
+    serve_parser.add_argument("--seed", type=int, default=None, help="seed for the layout and traffic")
+    bench_parser = subparsers.add_parser("bench", help="measure bandwidth and tick time with bot clients on loopback")
+    bench_parser.add_argument("--players", type=int, nargs="+", default=[1, 2, 4, 8, NET_MAX_PLAYERS])
+    bench_parser.add_argument("--seconds", type=float, default=5.0, help="length of each run")
+    bench_parser.add_argument("--seed", type=int, default=1)
+    for sub in (serve_parser, bench_parser):
+        sub.add_argument("--latency-ms", type=float, default=0.0, help="simulated one-way delay on every packet")
+        sub.add_argument("--loss", type=float, default=0.0, help="fraction of packets to drop, e.g. 0.05")
+    args = parser.parse_args(argv)
+
+    from game_core import GameAssets
+    from headless import init_headless
+    init_headless()
+    assets = GameAssets()
+    latency = args.latency_ms / 1000
+
+    if args.command == "bench":
+        asyncio.run(benchmark(assets, args.players, args.seconds, latency, args.loss, args.seed))
+    else:
+        async def serve():
+            server = GameServer(assets, args.seed, latency, args.loss)
+            await asyncio.get_running_loop().create_datagram_endpoint(lambda: server, local_addr=(args.host, args.port))
+            print(f"Serving on {args.host}:{args.port}")
+            await server.run()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Per-phase frame profiler.
+
+Code under measurement wraps each phase in `with profiler.phase("name"):`.
+Times are taken with perf_counter_ns, summed per frame and stored in a
+fixed-size ring buffer when end_frame() is called. While the profiler is
+disabled, phase() hands back a shared do-nothing context manager, so the
+instrumentation costs one method call per phase.
+"""
+import csv
+import json
+from time import perf_counter_ns
+
+import numpy as np
+import pygame
+
+from settings import (
+    WHITE, BLACK, FIXED_DT,
+    PROFILER_HISTORY_FRAMES, PROFILER_MAX_PHASES, PROFILER_OVERLAY_REFRESH, PROFILER_OVERLAY_FONT_SIZE,
+)
+
+FRAME_PHASE = "frame" # Wall time from one end_frame() to the next
+PERCENTILES = (50, 95, 99)
+
+
+class _NullSection:
+    """Context manager used while profiling is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_SECTION = _NullSection()
+
+
+class _Section:
+    """Times one phase and adds the result to the current frame's row."""
+    def __init__(self, current_frame, index):
+        self.current_frame = current_frame
+        self.index = index
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.current_frame[self.index] += perf_counter_ns() - self.start
+        return False
+
+
+class FrameProfiler:
+    """Collects per-phase frame timings in a ring buffer of history_frames rows."""
+    def __init__(self, enabled=False, history_frames=PROFILER_HISTORY_FRAMES, max_phases=PROFILER_MAX_PHASES):
+        self.enabled = enabled
+        self.history_frames = history_frames
+        self.max_phases = max_phases
+
+        self.phase_names = []
+        self._sections = {}
+        self.history = np.zeros((history_frames, max_phases), dtype=np.int64) # Nanoseconds
+        self._current_frame = np.zeros(max_phases, dtype=np.int64)
+        self.frames_recorded = 0
+        self._last_frame_end = None
+        self._phase_index(FRAME_PHASE)
+
+    def _phase_index(self, name):
+        if name not in self._sections:
+            if len(self.phase_names) >= self.max_phases:
+                raise ValueError(f"profiler already tracks {self.max_phases} phases, can't add {name!r}")
+            self._sections[name] = _Section(self._current_frame, len(self.phase_names))
+            self.phase_names.append(name)
+        return self._sections[name].index
+
+    def phase(self, name):
+        """Returns a context manager that times the enclosed block as `name`."""
+        if not self.enabled:
+            return _NULL_SECTION
+        section = self._sections.get(name)
+        if section is None:
+            self._phase_index(name)
+            section = self._sections[name]
+        return section
+
+    def end_frame(self):
+        """Stores the current frame's timings in the ring buffer and starts a new frame."""
+        if not self.enabled:
+            self._last_frame_end = None
+            return
+        now = perf_counter_ns()
+        if self._last_frame_end is not None:
+            self._current_frame[0] = now - self._last_frame_end
+            self.history[self.frames_recorded % self.history_frames] = self._current_frame
+            self.frames_recorded += 1
+        self._last_frame_end = now
+        self._current_frame[:] = 0
+
+    def samples(self):
+        """Returns the recorded rows, oldest first, in milliseconds."""
+        count = min(self.frames_recorded, self.history_frames)
+        start = self.frames_recorded % self.history_frames if self.frames_recorded > self.history_frames else 0
+        rows = np.roll(self.history, -start, axis=0)[:count, :len(self.phase_names)]
+        return rows / 1e6
+
+    def summary(self, spike_ms=FIXED_DT):
+        """Returns {phase: {"p50", "p95", "p99", "max", "spikes"}} in milliseconds.
+
+        "spikes" counts frames where the phase took longer than spike_ms,
+        which defaults to the length of one simulation step.
+        """
+        samples = self.samples()
+        result = {}
+        if len(samples) == 0:
+            return result
+        for index, name in enumerate(self.phase_names):
+            column = samples[:, index]
+            p50, p95, p99 = np.percentile(column, PERCENTILES)
+            result[name] = {
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "max": float(column.max()),
+                "spikes": int((column > spike_ms).sum()),
+            }
+        return result
+
+    def export(self, path):
+        """Writes the recorded frames to path; .json gets a summary too, anything else is CSV."""
+        samples = self.samples()
+        if str(path).endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({
+                    "phases": self.phase_names,
+                    "summary": self.summary(),
+                    "frames_ms": samples.tolist(),
+                }, f, indent=2)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame"] + [f"{name}_ms" for name in self.phase_names])
+                first_frame = self.frames_recorded - len(samples)
+                for offset, row in enumerate(samples):
+                    writer.writerow([first_frame + offset] + [f"{value:.4f}" for value in row])
+
+    def format_summary(self):
+        """Returns the summary as aligned text lines."""
+        lines = [f"{'phase':<12}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'spikes':>8}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<12}{stats['p50']:>8.3f}{stats['p95']:>8.3f}{stats['p99']:>8.3f}"
+                         f"{stats['max']:>8.3f}{stats['spikes']:>8}")
+        return lines
+
+
+class ProfilerOverlay:
+    """Draws a profiler's rolling percentiles in the corner of the window.
+
+    The text is only re-rendered every PROFILER_OVERLAY_REFRESH frames; in
+    between, the cached surface is blitted as is.
+    """
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.visible = False
+        self.font = pygame.font.Font(None, PROFILER_OVERLAY_FONT_SIZE)
+        self._surface = None
+        self._frames_until_refresh = 0
+
+    def toggle(self):
+        """Shows or hides the overlay; showing it also switches the profiler on."""
+        self.visible = not self.visible
+        if self.visible:
+            self.profiler.enabled = True
+        self._frames_until_refresh = 0
+
+    def _render(self):
+        lines = self.profiler.format_summary()
+        line_height = self.font.get_linesize()
+        rendered = [self.font.render(line, True, WHITE) for line in lines]
+        width = max(text.get_width() for text in rendered) + 8
+        surface = pygame.Surface((width, line_height * len(rendered) + 8))
+        surface.fill(BLACK)
+        surface.set_alpha(200)
+        for i, text in enumerate(rendered):
+            surface.blit(text, (4, 4 + i * line_height))
+        self._surface = surface
+
+    def draw(self, window):
+        if not self.visible:
+            return
+        if self._frames_until_refresh <= 0:
+            self._render()
+            self._frames_until_refresh = PROFILER_OVERLAY_REFRESH
+        self._frames_until_refresh -= 1
+        window.blit(self._surface, (0, 0))
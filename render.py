@@ -0,0 +1,128 @@
+import numpy as np
+import pygame
+
+from settings import BLACK
+
+# Render queue layers, drawn in increasing order
+LAYER_BACKGROUND = 0
+LAYER_TRAFFIC = 10
+LAYER_PLAYER = 20
+LAYER_HUD = 30
+
+
+class RenderQueue:
+    """Collects one frame's blits by layer and draws each layer with a single blits() call.
+
+    Entries are (surface, position) or (surface, position, area) tuples,
+    the same as Surface.blits() takes. submit() culls an entry that falls
+    outside the viewport; submit_sprites() culls a whole batch of
+    positions with NumPy, so the per-entry Python work is one tuple for
+    each sprite that is actually drawn. Layers are bucketed as they are
+    submitted, so flush() only sorts the handful of layer numbers.
+    """
+    def __init__(self, viewport_size):
+        self.width, self.height = viewport_size
+        self.layers = {} # Layer -> entry list, kept between frames and cleared by flush()
+        self.culled = 0 # Entries dropped since the last flush
+
+    def _entries(self, layer):
+        entries = self.layers.get(layer)
+        if entries is None:
+            entries = self.layers[layer] = []
+        return entries
+
+    def submit(self, layer, surface, position, area=None):
+        x, y = position
+        width, height = surface.get_size() if area is None else area[2:]
+        if x >= self.width or y >= self.height or x + width <= 0 or y + height <= 0:
+            self.culled += 1
+            return
+        self._entries(layer).append((surface, position) if area is None else (surface, position, area))
+
+    def submit_many(self, layer, entries):
+        """Adds entries the caller has already clipped to the viewport."""
+        self._entries(layer).extend(entries)
+
+    def submit_sprites(self, layer, images, indices, x, y, width, height):
+        """Adds images[indices[i]] at (x[i], y[i]) for every sprite that is on screen.
+
+        indices, x and y are NumPy arrays; every sprite is width x height.
+        """
+        visible = np.flatnonzero((x < self.width) & (y < self.height) & (x > -width) & (y > -height))
+        self.culled += x.size - visible.size
+        self._entries(layer).extend(zip(map(images.__getitem__, indices[visible].tolist()),
+                                        zip(x[visible].tolist(), y[visible].tolist())))
+
+    def flush(self, target):
+        """Draws everything submitted since the last flush onto target, lowest layer first."""
+        layers = self.layers
+        for layer in sorted(layers):
+            entries = layers[layer]
+            if entries:
+                target.blits(entries, doreturn=False)
+                entries.clear()
+        self.culled = 0
+
+
+class PixelScaler:
+    """Presents the native-resolution frame on a window of any size.
+
+    The frame is scaled by the largest whole-number factor that fits the
+    window (nearest neighbour, so pixel art stays sharp) and centred, with
+    black bars filling any space left over. The scale goes straight into a
+    subsurface of the window, so there is one upscale pass and no extra
+    blit per frame.
+
+    When both surfaces share a 32-bit pixel format the upscale is done on
+    the raw pixels with NumPy: each native row is widened once and copied
+    to `scale` window rows, which is several times faster than
+    pygame.transform.scale for whole-number factors.
+    """
+    def __init__(self, native_size):
+        self.native_size = native_size
+        self.scale = 1
+        self._window = None
+        self._window_size = None
+        self._target = None
+        self._border_rects = []
+
+    def _layout(self, window):
+        native_width, native_height = self.native_size
+        window_width, window_height = window.get_size()
+        self.scale = max(1, min(window_width // native_width, window_height // native_height))
+        scaled_width = min(native_width * self.scale, window_width)
+        scaled_height = min(native_height * self.scale, window_height)
+        target_rect = pygame.Rect(0, 0, scaled_width, scaled_height)
+        target_rect.center = (window_width // 2, window_height // 2)
+
+        self._window = window
+        self._window_size = (window_width, window_height)
+        self._target = window.subsurface(target_rect)
+        self._border_rects = [rect for rect in (
+            pygame.Rect(0, 0, window_width, target_rect.top), # Top
+            pygame.Rect(0, target_rect.bottom, window_width, window_height - target_rect.bottom), # Bottom
+            pygame.Rect(0, target_rect.top, target_rect.left, scaled_height), # Left
+            pygame.Rect(target_rect.right, target_rect.top, window_width - target_rect.right, scaled_height), # Right
+        ) if rect.width > 0 and rect.height > 0]
+
+    def present(self, native_surface, window):
+        """Upscales native_surface onto window."""
+        if window is not self._window or window.get_size() != self._window_size:
+            self._layout(window)
+
+        for rect in self._border_rects:
+            window.fill(BLACK, rect)
+
+        target = self._target
+        native_width, native_height = native_surface.get_size()
+        if target.get_size() == (native_width, native_height):
+            target.blit(native_surface, (0, 0))
+        elif (target.get_size() == (native_width * self.scale, native_height * self.scale)
+              and native_surface.get_bitsize() == 32 and native_surface.get_masks() == target.get_masks()):
+            # surfarray arrays are indexed [x, y]; transpose so rows are contiguous
+            source_rows = pygame.surfarray.pixels2d(native_surface).T
+            target_rows = pygame.surfarray.pixels2d(target).T
+            wide_rows = np.repeat(source_rows, self.scale, axis=1)
+            target_rows.reshape(native_height, self.scale, native_width * self.scale)[...] = wide_rows[:, None, :]
+        else:
+            pygame.transform.scale(native_surface, target.get_size(), target)
@@ -0,0 +1,285 @@
+"""Input recording and deterministic replay.
+
+A recording is the layout seed plus one key bitmask per frame (A, D, R, Q),
+run-length encoded into a small binary file. GameCore only depends on the
+seed, the keys and dt, so feeding the masks back with the recorded fixed
+dt re-simulates the run exactly, as fast as the CPU allows. Usage:
+
+    python main.py --record run.carrec
+    python -m replay run.carrec                 # re-simulate and check crash frames
+    python -m replay run.carrec --seek 36000 --watch
+"""
+import argparse
+import struct
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, FIXED_DT, TARGET_FPS, REPLAY_CHECKPOINT_INTERVAL
+from game_core import GameAssets, GameCore, KeyState
+
+KEY_A = 1
+KEY_D = 2
+KEY_R = 4
+KEY_Q = 8
+STEER_KEYS = ((pygame.K_a, KEY_A), (pygame.K_d, KEY_D)) # Read from the held key state
+EVENT_KEYS = {pygame.K_r: KEY_R, pygame.K_q: KEY_Q} # Recorded on the frame they are pressed
+
+RECORDING_MAGIC = b"CARINPUT"
+RECORDING_VERSION = 1
+# Magic, version, seed, dt in milliseconds, number of frames, number of crash frames
+HEADER = struct.Struct("<8sBQdII")
+SEED_MASK = 2**64 - 1 # Seeds are stored unsigned
+
+# Every mask maps to a ready-made key state, so replay allocates nothing per frame
+MASK_KEY_STATES = [KeyState(key for key, bit in STEER_KEYS if mask & bit) for mask in range(16)]
+
+
+def keys_to_mask(keys):
+    """Returns the A/D bits of a pygame.key.get_pressed() style key state."""
+    mask = 0
+    for key, bit in STEER_KEYS:
+        if keys[key]:
+            mask |= bit
+    return mask
+
+
+def apply_frame(game, mask, dt):
+    """Runs one recorded frame the way main.py's loop does.
+
+    R and Q only act on the game over screen, like in handle_events().
+    Returns False once Q has been pressed.
+    """
+    running = True
+    if game.game_over:
+        if mask & KEY_R:
+            game.reset() # Game is no longer over after reset
+        if game.game_over and mask & KEY_Q:
+            running = False
+    game.update(MASK_KEY_STATES[mask & (KEY_A | KEY_D)], dt)
+    return running
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class InputRecording:
+    """A seed, a fixed dt and the per-frame key masks of one play session.
+
+    Masks are kept as (mask, run length) pairs. crash_frames lists the
+    frames on which the game ended, so a replay can check that it
+    reproduces every collision on the same frame.
+    """
+    def __init__(self, seed, dt=FIXED_DT, runs=None, crash_frames=None):
+        self.seed = seed
+        self.dt = dt
+        self.runs = runs if runs is not None else []
+        self.crash_frames = crash_frames if crash_frames is not None else []
+
+    @property
+    def num_frames(self):
+        return sum(count for _, count in self.runs)
+
+    def append(self, mask):
+        if self.runs and self.runs[-1][0] == mask:
+            self.runs[-1] = (mask, self.runs[-1][1] + 1)
+        else:
+            self.runs.append((mask, 1))
+
+    def frame_masks(self):
+        """Returns every frame's mask as a uint8 array (one byte per frame)."""
+        if not self.runs:
+            return np.zeros(0, dtype=np.uint8)
+        masks, counts = zip(*self.runs)
+        return np.repeat(np.array(masks, dtype=np.uint8), counts)
+
+    def to_bytes(self):
+        out = bytearray(HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, self.seed, self.dt,
+                                    self.num_frames, len(self.crash_frames)))
+        out += struct.pack(f"<{len(self.crash_frames)}I", *self.crash_frames)
+        for mask, count in self.runs:
+            out.append(mask)
+            _write_varint(out, count)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, dt, num_frames, num_crashes = HEADER.unpack_from(data)
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError(f"not a version {RECORDING_VERSION} input recording")
+        offset = HEADER.size
+        crash_frames = list(struct.unpack_from(f"<{num_crashes}I", data, offset))
+        offset += 4 * num_crashes
+
+        runs = []
+        while offset < len(data):
+            mask = data[offset]
+            count, offset = _read_varint(data, offset + 1)
+            runs.append((mask, count))
+        recording = cls(seed, dt, runs, crash_frames)
+        if recording.num_frames != num_frames:
+            raise ValueError(f"recording is truncated: expected {num_frames} frames, found {recording.num_frames}")
+        return recording
+
+    def save(self, path):
+        data = self.to_bytes() # Before opening, so a failure can't leave an emptied file behind
+        with open(path, "wb") as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+class InputRecorder:
+    """Records the interactive loop's input into an InputRecording.
+
+    handle_events() reports R and Q presses with key_down(); the loop calls
+    record_frame() after every simulation step. A "frame" of a recording is
+    one fixed step, however many of them a drawn frame took.
+    """
+    def __init__(self, seed, dt=FIXED_DT):
+        self.recording = InputRecording(seed, dt)
+        self._pending_events = 0
+        self._was_game_over = False
+
+    def key_down(self, key):
+        self._pending_events |= EVENT_KEYS.get(key, 0)
+
+    def record_frame(self, keys, game):
+        frame = self.recording.num_frames
+        self.recording.append(keys_to_mask(keys) | self._pending_events)
+        self._pending_events = 0
+        if game.game_over and not self._was_game_over:
+            self.recording.crash_frames.append(frame)
+        self._was_game_over = game.game_over
+
+    def save(self, path):
+        self.recording.save(path)
+
+
+class ReplayPlayer:
+    """Plays a recording back into a GameCore, with seeking.
+
+    A snapshot of the game is kept every checkpoint_interval frames as
+    they are played, together with the crashes found before it. seek()
+    restores the closest snapshot at or before the target frame and
+    re-simulates the rest, so jumping around a long recording only replays
+    a few seconds at a time, and crash_frames always holds the crashes of
+    frames 0 to frame - 1, whichever way the replay got there.
+    """
+    def __init__(self, recording, assets, checkpoint_interval=REPLAY_CHECKPOINT_INTERVAL, profiler=None):
+        self.recording = recording
+        self.masks = recording.frame_masks().tolist()
+        self.checkpoint_interval = checkpoint_interval
+        self.game = GameCore(assets, seed=recording.seed, verbose=False, profiler=profiler)
+        self.frame = 0 # Index of the next frame to play
+        self.checkpoints = {0: (self.game.snapshot(), frozenset())} # Frame -> (snapshot, crash frames before it)
+        self.crash_frames = set()
+
+    @property
+    def finished(self):
+        return self.frame >= len(self.masks)
+
+    def step(self):
+        """Plays one frame. Returns False when the recording has ended."""
+        if self.finished:
+            return False
+        game = self.game
+        was_game_over = game.game_over
+        apply_frame(game, self.masks[self.frame], self.recording.dt)
+        if game.game_over and not was_game_over:
+            self.crash_frames.add(self.frame)
+        self.frame += 1
+        if self.frame % self.checkpoint_interval == 0 and self.frame not in self.checkpoints:
+            self.checkpoints[self.frame] = (game.snapshot(), frozenset(self.crash_frames))
+        return True
+
+    def run(self, until=None):
+        """Plays frames until frame `until` (default: the end of the recording)."""
+        end = len(self.masks) if until is None else min(until, len(self.masks))
+        while self.frame < end:
+            self.step()
+
+    def seek(self, frame):
+        """Moves to the start of `frame`, restoring the nearest checkpoint first."""
+        frame = max(0, min(frame, len(self.masks)))
+        checkpoint = max(f for f in self.checkpoints if f <= frame)
+        if not checkpoint <= self.frame <= frame: # Playing on from here would be slower, or impossible
+            snapshot, crash_frames = self.checkpoints[checkpoint]
+            self.game.restore(snapshot)
+            self.crash_frames = set(crash_frames)
+            self.frame = checkpoint
+        self.run(until=frame)
+
+    def mismatched_crashes(self):
+        """Returns recorded crash frames before the current one that weren't reproduced, and reproduced ones that weren't recorded."""
+        recorded = {f for f in self.recording.crash_frames if f < self.frame}
+        return sorted(recorded - self.crash_frames), sorted(self.crash_frames - recorded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate a recorded game and check that it plays out the same.")
+    parser.add_argument("path", help="recording written by main.py --record")
+    parser.add_argument("--seek", type=int, default=0, metavar="FRAME", help="start from this frame")
+    parser.add_argument("--watch", action="store_true", help="show the replay in a window at normal speed")
+    args = parser.parse_args(argv)
+
+    recording = InputRecording.load(args.path)
+    if args.watch:
+        pygame.init()
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption("2D Car Game - Replay")
+    else:
+        from headless import init_headless
+        screen = init_headless()
+    player = ReplayPlayer(recording, GameAssets())
+
+    start = time.perf_counter()
+    player.seek(args.seek)
+    if args.watch:
+        clock = pygame.time.Clock()
+        running = True
+        while running and player.step():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+            player.game.draw(screen)
+            pygame.display.flip()
+            clock.tick(TARGET_FPS)
+    else:
+        player.run()
+    elapsed = time.perf_counter() - start
+
+    print(f"{player.frame} of {recording.num_frames} frames in {elapsed:.3f}s "
+          f"(seed {recording.seed}, {len(recording.runs)} runs)")
+    missing, unexpected = player.mismatched_crashes()
+    pygame.quit()
+    if missing or unexpected:
+        print(f"Replay diverged: crashes recorded but not reproduced at {missing}, "
+              f"reproduced but not recorded at {unexpected}")
+        return 1
+    print(f"All {len(player.crash_frames)} crashes reproduced on the same frame")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
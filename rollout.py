@@ -0,0 +1,265 @@
+"""Process-pool episode runner with shared-memory observation buffers.
+
+Each worker process runs headless GameCore episodes and writes every
+step's frame and scalar state into its own ring buffer in
+multiprocessing.shared_memory, so frames are never pickled. Only the
+small per-episode statistics go through a queue. Usage:
+
+    python -m rollout --workers 8 --episodes 4 --seed 1
+"""
+import argparse
+import multiprocessing
+import queue
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from settings import SCREEN_WIDTH, NATIVE_WIDTH, NATIVE_HEIGHT, SCALED_TILE_WIDTH, SCALED_TILE_HEIGHT, FIXED_DT
+
+# Scalar state written for every step, one float64 column each
+STATE_FIELDS = ("episode", "step", "player_x", "camera_x", "background_scroll_y", "player_invincible", "game_over")
+DEFAULT_FRAME_SIZE = (NATIVE_WIDTH, NATIVE_HEIGHT) # Frames at native resolution need no scaling
+DEFAULT_RING_SLOTS = 64
+
+# Header slots at the start of each worker's shared memory block
+HEADER_WRITTEN = 0 # Number of steps written so far
+HEADER_DONE = 1 # Set to 1 when the worker has finished all its episodes
+HEADER_FIELDS = 2
+
+
+def worker_seed(base_seed, worker_index):
+    """Returns the seed a worker uses to draw its episode layout seeds."""
+    return f"{base_seed}:{worker_index}"
+
+
+class RingBuffer:
+    """NumPy views of one worker's shared memory block.
+
+    The block holds a small int64 header followed by `slots` rows of
+    scalar state and, if frames are recorded, `slots` RGB frames.
+    """
+    def __init__(self, shm, slots, frame_size):
+        self.shm = shm
+        self.slots = slots
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        offset = self.header.nbytes
+        self.state = np.ndarray((slots, len(STATE_FIELDS)), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += self.state.nbytes
+        self.frames = None
+        if frame_size is not None:
+            width, height = frame_size
+            self.frames = np.ndarray((slots, height, width, 3), dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    @staticmethod
+    def nbytes(slots, frame_size):
+        size = HEADER_FIELDS * 8 + slots * len(STATE_FIELDS) * 8
+        if frame_size is not None:
+            size += slots * frame_size[0] * frame_size[1] * 3
+        return size
+
+
+def _run_worker(worker_index, shm_name, slots, frame_size, free_slots, filled_slots, stats_queue,
+                episodes, max_steps, base_seed):
+    """Worker process entry point: runs episodes and fills the ring buffer."""
+    # Imported here so the parent process never initializes pygame
+    import pygame
+    from headless import init_headless, random_key_script
+    from game_core import GameAssets, GameCore
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = RingBuffer(shm, slots, frame_size)
+    init_headless()
+    assets = GameAssets()
+    frame_surface = pygame.Surface(frame_size) if frame_size is not None else None
+    rng = random.Random(worker_seed(base_seed, worker_index))
+
+    written = 0
+    for episode in range(episodes):
+        episode_seed = rng.getrandbits(64) # Seeds the chunked world, the traffic and the key script
+        game = GameCore(assets, seed=episode_seed, verbose=False)
+        key_script = random_key_script(episode_seed)
+
+        for step in range(max_steps):
+            game.update(next(key_script), FIXED_DT)
+
+            free_slots.acquire() # Wait for the consumer if the ring is full
+            slot = written % slots
+            ring.state[slot] = (episode, step, game.player_car.rect.x, game.camera_x,
+                                game.background_scroll_y, game.player_invincible, game.game_over)
+            if frame_surface is not None:
+                native_surface = game.draw_native()
+                if frame_size != native_surface.get_size():
+                    native_surface = pygame.transform.scale(native_surface, frame_size, frame_surface)
+                # pixels3d is (width, height, 3); frames are stored row-major
+                np.copyto(ring.frames[slot], pygame.surfarray.pixels3d(native_surface).transpose(1, 0, 2))
+            written += 1
+            ring.header[HEADER_WRITTEN] = written
+            filled_slots.release()
+
+            if game.game_over:
+                break
+
+        crash_x = SCREEN_WIDTH // 2 - game.player_car.rect.width // 2 + game.camera_x
+        crash_y = game.player_car.rect.y + game.background_scroll_y
+        stats_queue.put({
+            "worker": worker_index,
+            "episode": episode,
+            "seed": episode_seed,
+            "steps": step + 1,
+            "survival_ms": (step + 1) * FIXED_DT,
+            "crashed": game.game_over,
+            "crash_x": crash_x if game.game_over else None,
+            "crash_y": crash_y if game.game_over else None,
+            "crash_tile": (crash_y // SCALED_TILE_HEIGHT, crash_x // SCALED_TILE_WIDTH) if game.game_over else None,
+        })
+
+    ring.header[HEADER_DONE] = 1
+    filled_slots.release() # Wake the consumer so it sees the done flag
+    del ring
+    shm.close()
+    pygame.quit()
+
+
+class RolloutRunner:
+    """Spreads headless episodes over a pool of worker processes.
+
+    Use as a context manager, consume steps with iter_steps() (workers
+    block once their ring buffer is full) and read finished episodes with
+    episode_stats(). Pass frame_size=None to record scalar state only.
+    """
+    def __init__(self, num_workers, episodes_per_worker, max_steps=10000, seed=0,
+                 frame_size=DEFAULT_FRAME_SIZE, slots=DEFAULT_RING_SLOTS):
+        if max_steps < 1:
+            raise ValueError(f"max_steps must be at least 1, got {max_steps}")
+        self.num_workers = num_workers
+        self.episodes_per_worker = episodes_per_worker
+        self.max_steps = max_steps
+        self.seed = seed
+        self.frame_size = frame_size
+        self.slots = slots
+
+        self._context = multiprocessing.get_context("spawn")
+        self._stats_queue = self._context.Queue()
+        self._workers = []
+        self._stats = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        for worker_index in range(self.num_workers):
+            shm = shared_memory.SharedMemory(create=True, size=RingBuffer.nbytes(self.slots, self.frame_size))
+            free_slots = self._context.Semaphore(self.slots)
+            filled_slots = self._context.Semaphore(0)
+            process = self._context.Process(
+                target=_run_worker,
+                args=(worker_index, shm.name, self.slots, self.frame_size, free_slots, filled_slots,
+                      self._stats_queue, self.episodes_per_worker, self.max_steps, self.seed),
+                daemon=True,
+            )
+            process.start()
+            self._workers.append({
+                "process": process,
+                "ring": RingBuffer(shm, self.slots, self.frame_size),
+                "free": free_slots,
+                "filled": filled_slots,
+                "read": 0,
+                "finished": False,
+            })
+
+    def iter_steps(self):
+        """Yields (worker_index, state_row, frame) for every simulated step.
+
+        state_row and frame are views into shared memory; they are only
+        valid until the next item is requested, so copy them to keep them.
+        frame is None when frames are not recorded.
+        """
+        active = [w for w in self._workers if not w["finished"]]
+        while active:
+            progressed = False
+            for worker_index, worker in enumerate(self._workers):
+                if worker["finished"]:
+                    continue
+                if not worker["filled"].acquire(block=False):
+                    # A worker that exits without setting the done flag has crashed; its traceback is on stderr
+                    exitcode = worker["process"].exitcode
+                    if exitcode is not None and not worker["ring"].header[HEADER_DONE]:
+                        raise RuntimeError(f"rollout worker {worker_index} exited with code {exitcode}")
+                    continue
+                progressed = True
+                ring = worker["ring"]
+                if worker["read"] == ring.header[HEADER_WRITTEN] and ring.header[HEADER_DONE]:
+                    worker["finished"] = True
+                    continue
+                slot = worker["read"] % self.slots
+                frame = ring.frames[slot] if ring.frames is not None else None
+                yield worker_index, ring.state[slot], frame
+                worker["read"] += 1
+                worker["free"].release()
+            active = [w for w in self._workers if not w["finished"]]
+            if not progressed and active:
+                time.sleep(0.0005) # Every worker is still simulating; don't spin at full speed
+
+    def drain(self):
+        """Consumes all remaining steps without looking at them; returns how many there were."""
+        return sum(1 for _ in self.iter_steps())
+
+    def episode_stats(self):
+        """Returns the statistics of every episode reported so far."""
+        while True:
+            try:
+                self._stats.append(self._stats_queue.get_nowait())
+            except queue.Empty:
+                return list(self._stats)
+
+    def close(self):
+        for worker in self._workers:
+            process = worker["process"]
+            if worker["ring"].header[HEADER_DONE]:
+                process.join(timeout=5)
+            if process.is_alive():
+                # Stopped early, or stuck: a worker waiting for ring space would never finish
+                process.kill()
+                process.join()
+        self.episode_stats() # Collect anything still in the queue before it goes away
+        for worker in self._workers:
+            shm = worker["ring"].shm
+            del worker["ring"]
+            shm.close()
+            shm.unlink()
+        self._workers = []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless episodes on a pool of worker processes.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--episodes", type=int, default=4, help="episodes per worker")
+    parser.add_argument("--max-steps", type=int, default=10000, help="step limit per episode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-frames", action="store_true", help="record scalar state only")
+    args = parser.parse_args(argv)
+    if args.max_steps < 1:
+        parser.error("--max-steps must be at least 1")
+
+    frame_size = None if args.no_frames else DEFAULT_FRAME_SIZE
+    start = time.perf_counter()
+    with RolloutRunner(args.workers, args.episodes, args.max_steps, args.seed, frame_size) as runner:
+        total_steps = runner.drain()
+    elapsed = time.perf_counter() - start
+    stats = runner.episode_stats()
+
+    crashes = [s for s in stats if s["crashed"]]
+    mean_survival = sum(s["survival_ms"] for s in stats) / len(stats) / 1000 if stats else 0
+    print(f"{len(stats)} episodes, {total_steps} steps in {elapsed:.2f}s on {args.workers} workers: "
+          f"{total_steps / elapsed:.0f} steps/s")
+    print(f"{len(crashes)} crashes, mean survival {mean_survival:.1f}s simulated")
+
+
+if __name__ == "__main__":
+    main()
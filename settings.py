@@ -0,0 +1,142 @@
+# --- Constants ---
+# Screen dimensions
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+
+# Native render resolution: the scene is drawn at the art's own pixel size and
+# upscaled once per frame, so one native pixel covers PIXEL_SCALE screen pixels
+PIXEL_SCALE = 4
+NATIVE_WIDTH = SCREEN_WIDTH // PIXEL_SCALE
+NATIVE_HEIGHT = SCREEN_HEIGHT // PIXEL_SCALE
+
+# Fonts, sized in native pixels (the default font gets hard to read below 14)
+GAME_OVER_FONT_SIZE = 20
+RESTART_QUIT_FONT_SIZE = 14
+
+# Sprite and Scaling Constants
+PLAYER_CAR_SPRITESHEET_PATH = "Mini Pixel Pack 2/Cars/Player_red (16 x 16).png"
+PLAYER_COLOR_SPRITESHEET_PATHS = [ # One car color per multiplayer slot, repeating
+    PLAYER_CAR_SPRITESHEET_PATH,
+    "Mini Pixel Pack 2/Cars/Player_blue (16 x 16).png",
+    "Mini Pixel Pack 2/Cars/Player_yellow (16 x 16).png",
+    "Mini Pixel Pack 2/Cars/Player_green (16 x 16).png",
+]
+CAR_SPRITE_WIDTH = 16
+CAR_SPRITE_HEIGHT = 16
+SCALED_CAR_WIDTH = CAR_SPRITE_WIDTH * PIXEL_SCALE
+SCALED_CAR_HEIGHT = CAR_SPRITE_HEIGHT * PIXEL_SCALE
+PLAYER_CAR_SPEED = 300 # Pixels per second of horizontal movement
+
+# Background Tile Constants
+DESERT_SPRITESHEET_PATH = "Mini Pixel Pack 2/Levels/Desert_details (16 x 16).png"
+TILE_SPRITE_WIDTH = 16
+TILE_SPRITE_HEIGHT = 16
+SCALED_TILE_WIDTH = TILE_SPRITE_WIDTH * PIXEL_SCALE
+SCALED_TILE_HEIGHT = TILE_SPRITE_HEIGHT * PIXEL_SCALE
+NUM_TILE_TYPES = 4 # Should match the number of distinct tile types in the spritesheet (e.g., plain, speckled, cactus, rock)
+TILE_WEIGHTS = [0.5, 0.3, 0.1, 0.1] # Plain, Speckled, Cactus, Rock
+ROCK_TILE_INDEX = 3 # Rock is the 4th tile in the desert spritesheet
+SAFE_TILE_INDEX = 0 # Plain tile, used to clear the player's starting area
+
+# For scrolling, the layout needs to be larger than the screen.
+LAYOUT_TILES_HIGH = (SCREEN_HEIGHT // SCALED_TILE_HEIGHT) * 2 # Twice screen height for vertical scroll
+LAYOUT_TILES_WIDE = (SCREEN_WIDTH // SCALED_TILE_WIDTH) * 2   # Twice screen width for horizontal scroll
+BACKGROUND_STRIP_ROWS = 4 # Layout rows pre-composed into each cached background strip
+BACKGROUND_MAX_STRIPS = 8 # Cached background strips kept before the least recently used is dropped
+
+# Level themes. The road cycles through them in LEVEL_ORDER, LEVEL_ROWS tile rows per level
+SUMMER_SPRITESHEET_PATH = "Mini Pixel Pack 2/Levels/Summer_details (16 x 16).png"
+WINTER_SPRITESHEET_PATH = "Mini Pixel Pack 2/Levels/Winter_details (16 x 16).png"
+HIGHWAY_WATER_PATH = "Mini Pixel Pack 2/Levels/Highway_water_color (16 x 16).png"
+HIGHWAY_WATER_ANIMATION_PATH = "Mini Pixel Pack 2/Levels/Highway_water_animation (16 x 16).png"
+LEVEL_ORDER = ["desert", "summer", "winter", "highway"]
+LEVEL_ROWS = 64 # Tile rows per level (about 34 seconds of driving); a multiple of BACKGROUND_STRIP_ROWS
+LEVEL_PRELOAD_ROWS = 32 # How far above the top of the screen the next level's textures start loading
+LEVEL_ANIMATION_INTERVAL = 500 # Milliseconds per frame of animated tiles (the highway water)
+
+# Asset pipeline
+ASSET_CACHE_DIR = ".sprite_cache" # Cropped and scaled sprites from earlier runs, keyed by sheet hash and scale
+ASSET_LOADER_THREADS = 4 # Threads decoding spritesheets at startup
+LOADING_SCREEN_POLL_MS = 15 # Milliseconds between loading screen redraws
+
+# Texture cache
+TEXTURE_CACHE_BUDGET = 256 * 1024 # Bytes of decoded sheets and tile surfaces kept before the least recently used is dropped
+TEXTURE_LOADER_THREADS = 2 # Background threads decoding the next level's sheets
+
+# Endless world streaming
+WORLD_CHUNK_ROWS = 8 # Tile rows generated together from one chunk seed
+WORLD_MAX_CHUNKS = 8 # Chunks kept in memory before the least recently used is dropped
+WORLD_PREFETCH_CHUNKS = 1 # Chunks generated ahead of the top of the screen
+
+# Background Scroll Speed
+BACKGROUND_SCROLL_SPEED_Y = 120 # Pixels per second for vertical scroll
+
+# Invincibility
+INVINCIBILITY_DURATION = 2000 # milliseconds (2 seconds)
+BLINK_INTERVAL = 200 # milliseconds (for blinking effect)
+
+# Obstacle properties: NPC traffic
+NPC_CARS_SPRITESHEET_PATH = "Mini Pixel Pack 2/Cars/NPC_cars (16 x 16).png"
+NUM_NPC_CAR_TYPES = 4 # One car per spritesheet row; columns face up, right, down, left
+OBSTACLE_SPAWN_DELAY = 100 # Milliseconds between traffic spawns
+OBSTACLE_SPEED = 300 # Fastest an NPC car moves down the screen, in pixels per second
+TRAFFIC_POOL_SIZE = 512 # NPC cars preallocated; spawns are skipped while the pool is full
+TRAFFIC_GRID_CELL = 128 # Broadphase cell size in pixels, at least the size of a car
+TRAFFIC_ONCOMING_SHARE = 0.3 # Fraction of NPC cars driving towards the player
+# World pixels per second. Cars going the player's way are slower than the road
+# scroll, so they still drift down the screen; oncoming cars top out at OBSTACLE_SPEED
+TRAFFIC_SAME_DIRECTION_SPEED = (30, 90)
+TRAFFIC_ONCOMING_SPEED = (60, OBSTACLE_SPEED - BACKGROUND_SCROLL_SPEED_Y)
+TRAFFIC_SPAWN_BAND = SCREEN_HEIGHT # Cars spawn up to this far above the top of the screen
+
+# HUD, built from the UI sheets and drawn at native resolution in the top right corner
+HUD_DIGITS_PATH = "Mini Pixel Pack 2/UI/Speed_indicator_numbers (8 x 8).png"
+HUD_DAMAGE_INDICATOR_PATH = "Mini Pixel Pack 2/UI/Damage_indicator (8 x 8).png" # Unlit, then lit
+HUD_FUEL_BAR_PATH = "Mini Pixel Pack 2/UI/Fuel_bar (16 x 56).png"
+HUD_PANEL_PATH = "Mini Pixel Pack 2/UI/Main_UI (32 x 176).png" # Labels and the gauge frame are cut from this
+HUD_GLYPH_SIZE = 8 # Digits, labels rows and the damage indicator are all 8 native pixels tall
+HUD_WIDTH = 32
+HUD_SPEED_DIGITS = 3
+HUD_DISTANCE_DIGITS = 4 # The distance in tile rows rolls over like an odometer
+
+# Frame timing
+TARGET_FPS = 60 # Frame rate of replays watched with python -m replay --watch
+SIMULATION_TICK_RATE = 60 # Simulation steps per second. Speeds are per second and timers in milliseconds, so this doesn't change the game speed
+FIXED_DT = 1000 / SIMULATION_TICK_RATE # milliseconds per simulation step
+MAX_TICKS_PER_FRAME = 5 # Catch-up steps allowed per rendered frame; after a longer stall the game slows instead of snowballing
+RENDER_FPS_CAP = 0 # Frame cap for the interactive window; 0 draws as often as the display allows
+
+# Autopilot
+AUTOPILOT_BUDGET_US = 200 # Planning time allowed per call; a search that needs more carries on next frame
+AUTOPILOT_ROWS_AHEAD = 8 # Tile rows above the car that a search plans through
+AUTOPILOT_LANE_SPACING = 16 # Pixels between the car positions a search considers
+AUTOPILOT_MARGIN = 6 # Pixels of clearance kept around rocks and NPC cars
+AUTOPILOT_TRAFFIC_CHUNK = 4 # NPC cars checked per piece of search work
+
+# Input recording and replay
+REPLAY_CHECKPOINT_INTERVAL = 600 # Frames between game state snapshots kept for seeking (10 seconds at 60 FPS)
+
+# Multiplayer
+NET_DEFAULT_PORT = 7777
+NET_MAX_PLAYERS = 16 # Player slots in every snapshot
+NET_SNAPSHOT_HISTORY = 64 # Sent snapshots the server keeps as delta bases (about a second at 60 ticks)
+NET_INPUT_REDUNDANCY = 16 # Recent steps of input repeated in every client packet, so lost packets cost nothing
+NET_INPUT_BUFFER = 8 # Queued inputs the server keeps per player before dropping the oldest
+NET_CLIENT_TIMEOUT = 5.0 # Seconds of silence before the server drops a player
+NET_PLAYER_SPACING = 96 # Pixels between the starting positions of neighbouring players
+
+# Benchmark suite
+BENCH_BASELINE_PATH = "bench_baseline.json"
+BENCH_REGRESSION_PERCENT = 25 # A scenario this much slower than its baseline fails the run
+BENCH_ROUNDS = 15 # Timed rounds per scenario; the median is reported
+
+# Frame profiler
+PROFILER_HISTORY_FRAMES = 600 # Frames kept in the timing ring buffer (10 seconds at 60 FPS)
+PROFILER_MAX_PHASES = 16
+PROFILER_OVERLAY_REFRESH = 30 # Frames between overlay text updates
+PROFILER_OVERLAY_FONT_SIZE = 20
@@ -0,0 +1,60 @@
+"""Tests for recording and replaying a game. Run with python -m pytest."""
+import random
+
+import pygame
+import pytest
+
+from headless import init_headless
+from game_core import GameAssets, GameCore, KeyState
+from replay import InputRecorder, InputRecording, ReplayPlayer
+from settings import FIXED_DT
+
+CHECKPOINT_INTERVAL = 300
+
+
+@pytest.fixture(scope="module")
+def assets():
+    init_headless()
+    return GameAssets()
+
+
+@pytest.fixture(scope="module")
+def recording(assets):
+    """A few thousand frames of random steering, restarting with R after every crash."""
+    rng = random.Random(5)
+    game = GameCore(assets, seed=7, verbose=False)
+    recorder = InputRecorder(7, FIXED_DT)
+    key_states = [KeyState(), KeyState((pygame.K_a,)), KeyState((pygame.K_d,))]
+    keys = key_states[0]
+    for frame in range(3000):
+        if game.game_over:
+            recorder.key_down(pygame.K_r)
+            game.reset()
+        if frame % 15 == 0:
+            keys = rng.choice(key_states)
+        game.update(keys, FIXED_DT)
+        recorder.record_frame(keys, game)
+    return InputRecording.from_bytes(recorder.recording.to_bytes())
+
+
+def test_seeking_keeps_crashes_consistent(assets, recording):
+    assert len(recording.crash_frames) > 2
+    player = ReplayPlayer(recording, assets, checkpoint_interval=CHECKPOINT_INTERVAL)
+    player.run()
+    assert player.mismatched_crashes() == ([], [])
+    assert sorted(player.crash_frames) == recording.crash_frames
+
+    # Back to the start: crashes found later must not count as reproduced before they happen
+    player.seek(0)
+    assert player.crash_frames == set()
+    assert player.mismatched_crashes() == ([], [])
+
+    # Forward past later checkpoints without playing the frames in between again
+    target = 5 * CHECKPOINT_INTERVAL + 10
+    player.seek(target)
+    assert player.frame == target
+    assert sorted(player.crash_frames) == [f for f in recording.crash_frames if f < target]
+    assert player.mismatched_crashes() == ([], [])
+
+    player.run()
+    assert player.mismatched_crashes() == ([], [])
@@ -0,0 +1,48 @@
+"""Tests for the texture cache's fallback when a level sheet is missing. Run with python -m pytest."""
+import os
+
+import pytest
+
+from headless import init_headless
+from collision import build_tile_mask
+from game_core import GameAssets, GameCore, KeyState, load_game_sprites
+from settings import WHITE, PIXEL_SCALE, FIXED_DT, DESERT_SPRITESHEET_PATH
+from textures import build_textures
+
+
+@pytest.fixture(scope="module", autouse=True)
+def display():
+    init_headless()
+
+
+def test_missing_sheet_gives_white_tiles(tmp_path):
+    path = str(tmp_path / "missing.png")
+    keys = [(path, (0, 0, 16, 16), 1), (path, (16, 0, 16, 16), PIXEL_SCALE), (path, None, 1)]
+    textures = build_textures(keys)
+
+    assert (path, None, 1) not in textures # The sheet itself isn't cached, so it's tried again next time
+    for key in keys[:2]:
+        tile = textures[key]
+        assert tile.get_size() == (16 * key[2], 16 * key[2])
+        assert tile.get_at((0, 0)) == WHITE
+        # Plain ground all over, so nothing in it collides
+        assert build_tile_mask(tile, tile.get_at((0, 0))).count() == 0
+
+
+def test_game_starts_without_a_level_sheet(tmp_path, monkeypatch):
+    # The assets as seen from a copy of the tree without the desert sheet
+    for root, _, files in os.walk("Mini Pixel Pack 2"):
+        os.makedirs(tmp_path / root, exist_ok=True)
+        for name in files:
+            source = os.path.join(root, name)
+            if source != DESERT_SPRITESHEET_PATH:
+                os.symlink(os.path.abspath(source), tmp_path / source)
+    monkeypatch.chdir(tmp_path)
+
+    assets = GameAssets(load_game_sprites(cache_dir=None))
+    assert all(mask.count() == 0 for mask in assets.desert_tile_masks)
+
+    game = GameCore(assets, seed=1, verbose=False)
+    for _ in range(600):
+        game.update(KeyState(), FIXED_DT)
+    game.draw_native()
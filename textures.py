@@ -0,0 +1,151 @@
+"""Texture cache with a memory budget and background loading.
+
+Surfaces are keyed by (sheet path, rect, scale): a rect of None is the
+whole decoded sheet, any other rect is a tile cut out of it and scaled by
+an integer factor. Entries are evicted least recently used first once
+their pixels take more than the budget; an evicted texture is simply
+decoded again the next time it is asked for.
+
+prefetch() hands keys to a thread pool, which decodes, converts and
+scales them off the frame loop. poll() moves finished batches into the
+cache; get() of a key that is still loading waits for its batch instead
+of loading it twice.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from settings import WHITE, TEXTURE_CACHE_BUDGET, TEXTURE_LOADER_THREADS
+
+
+def surface_bytes(surface):
+    width, height = surface.get_size()
+    return width * height * surface.get_bytesize()
+
+
+def decode_sheet(path):
+    """Loads a spritesheet, converted for fast blits if a display mode is set."""
+    try:
+        image = pygame.image.load(path)
+    except (pygame.error, OSError) as e: # A missing file raises FileNotFoundError, not pygame.error
+        print(f"Unable to load image {path}: {e}")
+        return None
+    if pygame.display.get_surface() is not None:
+        image = image.convert_alpha()
+    return image
+
+
+def build_textures(keys, sheets=None):
+    """Builds the surface of every key, decoding each sheet at most once.
+
+    Returns {key: surface}, including the decoded sheets themselves. This
+    is what the loader threads run, so it only touches new surfaces and
+    the read-only sheets it is given. A sheet that fails to load gives
+    plain white tiles, like the placeholders in GameAssets.
+    """
+    sheets = dict(sheets or {})
+    textures = {}
+    for key in keys:
+        path, rect, scale = key
+        sheet = sheets.get(path)
+        if sheet is None and path not in sheets:
+            sheet = sheets[path] = decode_sheet(path)
+            if sheet is not None:
+                textures[(path, None, 1)] = sheet
+        if rect is None:
+            if sheet is not None:
+                textures[key] = sheet
+            continue
+
+        width, height = rect[2] * scale, rect[3] * scale
+        if sheet is None:
+            texture = pygame.Surface((width, height))
+            texture.fill(WHITE)
+        else:
+            texture = sheet.subsurface(pygame.Rect(rect))
+            # A scaled tile is a new surface; a native one is copied so it doesn't keep the sheet alive
+            texture = pygame.transform.scale(texture, (width, height)) if scale != 1 else texture.copy()
+        textures[key] = texture
+    return textures
+
+
+class TextureCache:
+    """Budgeted LRU cache of sheet and tile surfaces, see the module docstring."""
+    def __init__(self, budget_bytes=TEXTURE_CACHE_BUDGET, loader_threads=TEXTURE_LOADER_THREADS):
+        self.budget_bytes = budget_bytes
+        self.loader_threads = loader_threads
+        self.textures = OrderedDict()
+        self.used_bytes = 0
+        self.pending = {} # Key -> future of the batch loading it
+        self.executor = None # Started by the first prefetch()
+        self.hits = 0
+        self.misses = 0 # Textures get() had to build on the spot, or wait for
+        self.evictions = 0
+
+    def get(self, path, rect=None, scale=1):
+        """Returns the texture for (path, rect, scale), loading it now if it isn't cached."""
+        key = (path, rect, scale)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.textures.move_to_end(key)
+            self.hits += 1
+            return texture
+
+        self.misses += 1
+        future = self.pending.get(key)
+        if future is not None:
+            self._store(future.result())
+        else:
+            sheet = self.textures.get((path, None, 1))
+            self._store(build_textures([key], {path: sheet} if sheet is not None else None))
+        texture = self.textures.get(key)
+        if texture is None: # Only the whole sheet of a missing file; it's never cached
+            texture = pygame.Surface((0, 0))
+        return texture
+
+    def contains(self, path, rect=None, scale=1):
+        return (path, rect, scale) in self.textures
+
+    def add(self, textures):
+        """Stores textures loaded elsewhere, given as {(path, rect, scale): surface}."""
+        return self._store(textures)
+
+    def prefetch(self, keys):
+        """Starts loading every key that is neither cached nor already loading."""
+        keys = [key for key in dict.fromkeys(keys) if key not in self.textures and key not in self.pending]
+        if not keys:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.loader_threads, thread_name_prefix="texture-loader")
+        future = self.executor.submit(build_textures, keys)
+        for key in keys:
+            self.pending[key] = future
+
+    def poll(self):
+        """Moves finished background loads into the cache. Returns the number of textures added."""
+        done = {future for future in self.pending.values() if future.done()}
+        added = 0
+        for future in done:
+            added += self._store(future.result())
+        return added
+
+    def _store(self, textures):
+        for key, texture in textures.items():
+            self.pending.pop(key, None)
+            previous = self.textures.pop(key, None)
+            if previous is not None:
+                self.used_bytes -= surface_bytes(previous)
+            self.textures[key] = texture
+            self.used_bytes += surface_bytes(texture)
+
+        # Evict least recently used first, but never what was just stored
+        while self.used_bytes > self.budget_bytes and len(self.textures) > len(textures):
+            _, texture = self.textures.popitem(last=False)
+            self.used_bytes -= surface_bytes(texture)
+            self.evictions += 1
+        return len(textures)
+
+    def clear(self):
+        self.textures.clear()
+        self.used_bytes = 0
@@ -0,0 +1,39 @@
+"""Compact tile-ID maps.
+
+Maps are uint8 arrays of tile IDs, where an ID is the tile's position in
+the desert spritesheet (and in GameAssets.desert_tile_images); the other
+level themes map the same IDs onto their own sheets (see levels.py). What a tile
+does in the game is looked up in TILE_PROPERTIES instead of comparing
+surfaces, so maps carry no pygame objects and can be generated in bulk.
+"""
+import numpy as np
+
+from settings import NUM_TILE_TYPES, TILE_WEIGHTS, ROCK_TILE_INDEX, SAFE_TILE_INDEX
+
+# Tile property flags
+TILE_SOLID = 1 # Crashes the car on contact
+TILE_DECORATIVE = 2 # Drawn detail the car drives over
+TILE_SAFE = 4 # Plain ground, used to clear the player's starting area
+
+# Properties of each tile ID: plain, speckled, cactus, rock
+TILE_PROPERTIES = np.full(NUM_TILE_TYPES, TILE_DECORATIVE, dtype=np.uint8)
+TILE_PROPERTIES[SAFE_TILE_INDEX] = TILE_SAFE
+TILE_PROPERTIES[ROCK_TILE_INDEX] = TILE_SOLID
+
+SOLID_TILES = (TILE_PROPERTIES & TILE_SOLID) != 0 # Bool lookup table indexed by tile ID
+
+
+def tile_probabilities():
+    """Returns normalized TILE_WEIGHTS, or uniform weights if they are misconfigured."""
+    if len(TILE_WEIGHTS) == NUM_TILE_TYPES and NUM_TILE_TYPES > 0:
+        weights = np.asarray(TILE_WEIGHTS, dtype=np.float64)
+        return weights / weights.sum()
+    return np.full(NUM_TILE_TYPES, 1.0 / NUM_TILE_TYPES)
+
+
+def generate_tile_map(num_rows, num_cols, rng):
+    """Draws a num_rows x num_cols map of tile IDs in a single weighted sampling call.
+
+    rng is a numpy.random.Generator.
+    """
+    return rng.choice(NUM_TILE_TYPES, size=(num_rows, num_cols), p=tile_probabilities()).astype(np.uint8)
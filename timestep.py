@@ -0,0 +1,51 @@
+"""Accumulator for running the simulation at a fixed rate under any frame rate."""
+from settings import FIXED_DT, MAX_TICKS_PER_FRAME, SIMULATION_TICK_RATE
+
+
+def step_distance(speed, step, tick_rate=SIMULATION_TICK_RATE):
+    """Whole pixels covered on simulation step number `step` (counting from 1) at `speed` pixels per second.
+
+    Each step moves from where speed * (step - 1) / tick_rate ends to
+    where speed * step / tick_rate ends, rounded down, so positions stay
+    whole pixels and a second of steps covers exactly `speed` at any
+    tick rate. Works elementwise on NumPy arrays of steps.
+    """
+    return speed * step // tick_rate - speed * (step - 1) // tick_rate
+
+
+def elapsed_ms(steps, tick_rate=SIMULATION_TICK_RATE):
+    """Whole milliseconds of simulated time after `steps` steps."""
+    return steps * 1000 // tick_rate
+
+
+class FixedTimestep:
+    """Turns wall-clock frame times into a whole number of fixed simulation steps.
+
+    Each frame's elapsed time goes into an accumulator; advance() returns
+    how many steps of step_ms it now holds. The leftover fraction of a step
+    is `alpha`, which the renderer uses to draw between the last two
+    simulation states. Dropped frames just mean more steps on the next
+    frame, so game speed and collisions don't depend on the frame rate,
+    up to max_steps per frame.
+    """
+    def __init__(self, step_ms=FIXED_DT, max_steps=MAX_TICKS_PER_FRAME):
+        self.step_ms = step_ms
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def advance(self, elapsed_ms):
+        """Adds a frame's elapsed time and returns the number of steps to simulate."""
+        self.accumulator += elapsed_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            # Too far behind (a stall, or a window being dragged): drop the backlog
+            steps = self.max_steps
+            self.accumulator %= self.step_ms
+        else:
+            self.accumulator -= steps * self.step_ms
+        return steps
+
+    @property
+    def alpha(self):
+        """How far the current frame is between the last two simulation steps, from 0 to 1."""
+        return self.accumulator / self.step_ms
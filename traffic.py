@@ -0,0 +1,214 @@
+"""Pooled NPC traffic.
+
+Cars live in a fixed pool of NumPy arrays (struct of arrays) instead of
+Sprite objects: spawning flips an `active` flag on a free slot and
+despawning flips it back, so nothing is allocated while the game runs.
+Positions are world coordinates, the same space as the background, and
+a uniform grid rebuilt every frame keeps collision queries local.
+"""
+import math
+
+import numpy as np
+
+from settings import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, PIXEL_SCALE, OBSTACLE_SPAWN_DELAY,
+    TRAFFIC_POOL_SIZE, TRAFFIC_GRID_CELL, TRAFFIC_ONCOMING_SHARE,
+    TRAFFIC_SAME_DIRECTION_SPEED, TRAFFIC_ONCOMING_SPEED, TRAFFIC_SPAWN_BAND, FIXED_DT,
+)
+
+GRID_KEY_STRIDE = 1 << 20 # Keys are cell_row * stride + cell_col, so columns must stay below this
+
+
+class UniformGrid:
+    """Buckets objects into square cells by their top-left corner.
+
+    build() sorts the objects by cell key once; query() then finds the
+    objects in each cell row of a rectangle with a binary search.
+    Objects must be no larger than a cell.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.sorted_keys = np.empty(0, dtype=np.int64)
+        self.sorted_indices = np.empty(0, dtype=np.int64)
+
+    def _keys(self, cell_cols, cell_rows):
+        return cell_rows * GRID_KEY_STRIDE + (cell_cols + GRID_KEY_STRIDE // 2)
+
+    def build(self, indices, x, y):
+        """Indexes objects `indices` whose top-left corners are at (x, y)."""
+        # Floored like drawing does; truncating would round the negative y of cars ahead of the start towards 0
+        keys = self._keys(np.floor(x).astype(np.int64) // self.cell_size, np.floor(y).astype(np.int64) // self.cell_size)
+        order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[order]
+        self.sorted_indices = indices[order]
+
+    def query(self, left, top, right, bottom):
+        """Returns indices of objects that may overlap the rect [left, right) x [top, bottom)."""
+        if len(self.sorted_keys) == 0:
+            return self.sorted_indices
+        # An object overlapping the rect can have its corner up to one cell up or left of it
+        first_col = (left - self.cell_size) // self.cell_size
+        last_col = (right - 1) // self.cell_size
+        first_row = (top - self.cell_size) // self.cell_size
+        last_row = (bottom - 1) // self.cell_size
+
+        # One binary search per cell row; each row's cells are a contiguous run of keys
+        cell_rows = np.arange(first_row, last_row + 1, dtype=np.int64)
+        starts = np.searchsorted(self.sorted_keys, self._keys(first_col, cell_rows), side="left")
+        ends = np.searchsorted(self.sorted_keys, self._keys(last_col, cell_rows), side="right")
+        slices = [self.sorted_indices[start:end] for start, end in zip(starts.tolist(), ends.tolist()) if start < end]
+        if not slices:
+            return self.sorted_indices[:0]
+        return np.concatenate(slices)
+
+
+class TrafficSystem:
+    """NPC cars that spawn ahead of the player and scroll past.
+
+    Car kinds index car_images_native and car_masks. Even kinds face up
+    and drive the same way as the player, slower than the road scrolls;
+    odd kinds face down and come towards the player.
+    """
+    def __init__(self, car_images_native, car_masks, rng, capacity=TRAFFIC_POOL_SIZE):
+        self.car_images_native = car_images_native
+        self.car_masks = car_masks
+        self.rng = rng # numpy.random.Generator
+        self.capacity = capacity
+        self.car_width, self.car_height = car_masks[0].get_size()
+
+        # Struct of arrays: one entry per pool slot
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.float64)
+        self.previous_y = np.zeros(capacity, dtype=np.float64) # y before the last update, for interpolated drawing
+        self.vy = np.zeros(capacity, dtype=np.float64) # World pixels per second
+        self.kind = np.zeros(capacity, dtype=np.uint8)
+        self.active = np.zeros(capacity, dtype=bool)
+
+        self.spawn_timer = 0
+        self.grid = UniformGrid(TRAFFIC_GRID_CELL)
+
+    @property
+    def count(self):
+        return int(self.active.sum())
+
+    def clear(self):
+        self.active[:] = False
+        self.vy[:] = 0
+        self.spawn_timer = 0
+        self._rebuild_grid()
+
+    def snapshot(self):
+        """Returns a copy of the pool, the spawn timer and the RNG state."""
+        return {
+            "x": self.x.copy(),
+            "y": self.y.copy(),
+            "vy": self.vy.copy(),
+            "kind": self.kind.copy(),
+            "active": self.active.copy(),
+            "spawn_timer": self.spawn_timer,
+            "rng_state": self.rng.bit_generator.state,
+        }
+
+    def restore(self, snapshot):
+        """Puts back the state saved by snapshot()."""
+        self.x[:] = snapshot["x"]
+        self.y[:] = snapshot["y"]
+        self.previous_y[:] = snapshot["y"]
+        self.vy[:] = snapshot["vy"]
+        self.kind[:] = snapshot["kind"]
+        self.active[:] = snapshot["active"]
+        self.spawn_timer = snapshot["spawn_timer"]
+        self.rng.bit_generator.state = snapshot["rng_state"]
+        self._rebuild_grid()
+
+    def save_previous(self):
+        """Remembers the current positions as the start of the next interpolation."""
+        np.copyto(self.previous_y, self.y)
+
+    def update(self, current_dt, scroll_y_offset):
+        """Moves every car one frame, despawns cars behind the player and spawns new ones ahead.
+
+        Call save_previous() first if the frame will be drawn interpolated.
+        """
+        self.y += self.vy * (FIXED_DT / 1000) # Inactive slots have vy == 0
+
+        # Despawn cars that left the bottom of the screen
+        screen_y = self.y - scroll_y_offset
+        gone = self.active & (screen_y > SCREEN_HEIGHT)
+        self.active[gone] = False
+        self.vy[gone] = 0
+
+        self._rebuild_grid()
+
+        self.spawn_timer += current_dt
+        num_spawns = int(self.spawn_timer // OBSTACLE_SPAWN_DELAY)
+        if num_spawns > 0:
+            self.spawn_timer -= num_spawns * OBSTACLE_SPAWN_DELAY
+            self._spawn(num_spawns, scroll_y_offset)
+
+    def _rebuild_grid(self):
+        indices = np.flatnonzero(self.active)
+        self.grid.build(indices, self.x[indices], self.y[indices])
+
+    def _spawn(self, num_spawns, scroll_y_offset):
+        free_slots = np.flatnonzero(~self.active)[:num_spawns]
+        num_spawns = len(free_slots)
+        if num_spawns == 0:
+            return
+
+        rng = self.rng
+        xs = rng.integers(0, SCREEN_WIDTH - self.car_width + 1, num_spawns)
+        ys = scroll_y_offset - self.car_height - rng.integers(0, TRAFFIC_SPAWN_BAND, num_spawns)
+        oncoming = rng.random(num_spawns) < TRAFFIC_ONCOMING_SHARE
+        speeds = np.where(oncoming,
+                          rng.uniform(*TRAFFIC_ONCOMING_SPEED, num_spawns),
+                          -rng.uniform(*TRAFFIC_SAME_DIRECTION_SPEED, num_spawns))
+        kinds = rng.integers(0, len(self.car_images_native) // 2, num_spawns) * 2 + oncoming
+
+        for slot, x, y, vy, kind in zip(free_slots, xs, ys, speeds, kinds):
+            # Don't drop a car on top of one that is already there
+            if self._overlapping(int(x), int(y), self.car_width, self.car_height).size:
+                continue
+            self.x[slot] = x
+            self.y[slot] = y
+            self.previous_y[slot] = y # New cars appear in place rather than sliding in from the slot's last use
+            self.vy[slot] = vy
+            self.kind[slot] = kind
+            self.active[slot] = True
+        self._rebuild_grid()
+
+    def _overlapping(self, left, top, width, height):
+        """Returns indices of active cars whose bounding boxes overlap the rect."""
+        candidates = self.grid.query(left, top, left + width, top + height)
+        if candidates.size == 0:
+            return candidates
+        cx = self.x[candidates]
+        cy = np.floor(self.y[candidates]).astype(np.int64)
+        hit = (cx < left + width) & (cx + self.car_width > left) & (cy < top + height) & (cy + self.car_height > top)
+        return candidates[hit]
+
+    def collides(self, mask, left, top):
+        """Returns True if `mask` with its top-left at world (left, top) touches a car."""
+        width, height = mask.get_size()
+        for index in self._overlapping(left, top, width, height):
+            offset = (int(self.x[index]) - left, math.floor(self.y[index]) - top)
+            if mask.overlap(self.car_masks[self.kind[index]], offset):
+                return True
+        return False
+
+    def submit(self, queue, layer, camera_x_offset, scroll_y_offset, alpha=1.0):
+        """Submits every active car to a RenderQueue at native resolution.
+
+        alpha blends each car between its position before and after the
+        last update (0 is before, 1 is after). Cars in the spawn band above
+        the screen are culled by the queue before any per-car Python work.
+        """
+        indices = np.flatnonzero(self.active)
+        if indices.size == 0:
+            return
+        previous_y = self.previous_y[indices]
+        y = previous_y + (self.y[indices] - previous_y) * alpha
+        screen_x = (self.x[indices] - camera_x_offset) // PIXEL_SCALE
+        screen_y = (np.floor(y).astype(np.int64) - scroll_y_offset) // PIXEL_SCALE
+        queue.submit_sprites(layer, self.car_images_native, self.kind[indices], screen_x, screen_y,
+                             self.car_width // PIXEL_SCALE, self.car_height // PIXEL_SCALE)
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from settings import (
+    SCALED_TILE_HEIGHT, LAYOUT_TILES_WIDE,
+    WORLD_CHUNK_ROWS, WORLD_MAX_CHUNKS, WORLD_PREFETCH_CHUNKS,
+)
+from tilemap import generate_tile_map
+
+
+class ChunkedWorld:
+    """An endless, seeded background made of tile chunks generated on demand.
+
+    The world is LAYOUT_TILES_WIDE tiles wide and wraps horizontally, like
+    the old fixed layout did, but it never repeats vertically. Rows are
+    grouped into chunks of WORLD_CHUNK_ROWS, each a uint8 array of tile IDs
+    generated from the world seed and its chunk index, so an evicted chunk
+    comes back identical. At most max_chunks are kept, least recently used
+    first out.
+
+    Tiles changed with set_tile() live in the cached chunk. The road only
+    scrolls forward, so chunks that have been evicted are behind the car
+    and are never visited again in the same run.
+    """
+    def __init__(self, seed, num_cols=LAYOUT_TILES_WIDE,
+                 chunk_rows=WORLD_CHUNK_ROWS, max_chunks=WORLD_MAX_CHUNKS):
+        self.seed = seed
+        self.num_cols = num_cols
+        self.chunk_rows = chunk_rows
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        # Fast path for the many lookups that hit the same chunk in a row
+        self._last_chunk_index = None
+        self._last_chunk = None
+
+    def _generate_chunk(self, chunk_index):
+        # Chunk indices go negative as the road scrolls, and seed sequences only take non-negative ints
+        rng = np.random.default_rng([self.seed, chunk_index % 2**64])
+        return generate_tile_map(self.chunk_rows, self.num_cols, rng)
+
+    def chunk(self, chunk_index):
+        """Returns the tile IDs of a chunk, generating it if needed."""
+        if chunk_index == self._last_chunk_index:
+            return self._last_chunk
+
+        chunk = self.chunks.get(chunk_index)
+        if chunk is None:
+            chunk = self._generate_chunk(chunk_index)
+            self.chunks[chunk_index] = chunk
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(chunk_index)
+
+        self._last_chunk_index = chunk_index
+        self._last_chunk = chunk
+        return chunk
+
+    def row(self, row):
+        """Returns one full row of tile IDs."""
+        chunk_index = row // self.chunk_rows
+        return self.chunk(chunk_index)[row - chunk_index * self.chunk_rows]
+
+    def tile_at(self, row, col):
+        """Returns the tile ID at a world cell; columns wrap around."""
+        return self.row(row).item(col % self.num_cols)
+
+    def set_tile(self, row, col, tile_id):
+        self.row(row)[col % self.num_cols] = tile_id
+
+    def prefetch(self, scroll_y_offset, view_height):
+        """Makes sure the chunks on screen and WORLD_PREFETCH_CHUNKS ahead are generated.
+
+        The road scrolls towards smaller y, so "ahead" is above the top of
+        the screen. Touching the visible chunks also keeps them at the
+        recently-used end of the LRU.
+        """
+        chunk_height = self.chunk_rows * SCALED_TILE_HEIGHT
+        first_chunk = scroll_y_offset // chunk_height - WORLD_PREFETCH_CHUNKS
+        last_chunk = (scroll_y_offset + view_height - 1) // chunk_height
+        for chunk_index in range(first_chunk, last_chunk + 1):
+            self.chunk(chunk_index)
+
+    def snapshot(self):
+        """Returns a copy of the cached chunks, including any tiles changed with set_tile()."""
+        return [(chunk_index, chunk.copy()) for chunk_index, chunk in self.chunks.items()]
+
+    def restore(self, snapshot):
+        """Puts back the chunks saved by snapshot(), in the same LRU order."""
+        self.chunks = OrderedDict((chunk_index, chunk.copy()) for chunk_index, chunk in snapshot)
+        self._last_chunk_index = None
+        self._last_chunk = None